@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -99,6 +100,98 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Every uwsgi worker and the image worker must share one cache, as the list
+# cache, the conditional requests and the token caches and revocations are
+# invalidated through it. The compose files point REDIS_URL at their redis
+# service. The local-memory fallback is per process and only fits runserver
+# and the tests; `manage.py check --deploy` rejects it.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 300,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ.get(
+                'CACHE_BACKEND',
+                'django.core.cache.backends.locmem.LocMemCache',
+            ),
+            'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+            'TIMEOUT': 300,
+        }
+    }
+if CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    # LocMemCache evicts the least recently used entries past MAX_ENTRIES.
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+    }
+
+# The tests run with their own local-memory cache, so they neither flush
+# nor read the shared cache of the compose services.
+TEST_RUNNER = 'app.test_runner.TestRunner'
+
+# Token lookups of CachedTokenAuthentication, in the shared cache and in a
+# per process LRU in front of it.
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.environ.get('TOKEN_AUTH_CACHE_TIMEOUT', 300))
+TOKEN_AUTH_LOCAL_CACHE_SIZE = int(
+    os.environ.get('TOKEN_AUTH_LOCAL_CACHE_SIZE', 1024)
+)
+TOKEN_AUTH_LOCAL_CACHE_TTL = int(
+    os.environ.get('TOKEN_AUTH_LOCAL_CACHE_TTL', 60)
+)
+
+# Idle lifetime in seconds of the DB tokens, 0 to never expire them. Using a
+# token renews it, at most once per TOKEN_RENEW_INTERVAL seconds.
+TOKEN_TTL = int(os.environ.get('TOKEN_TTL', 14 * 24 * 60 * 60))
+TOKEN_RENEW_INTERVAL = int(os.environ.get('TOKEN_RENEW_INTERVAL', 60 * 60))
+
+# Lifetimes in seconds of the signed tokens of user/tokens.py.
+ACCESS_TOKEN_LIFETIME = int(os.environ.get('ACCESS_TOKEN_LIFETIME', 300))
+REFRESH_TOKEN_LIFETIME = int(
+    os.environ.get('REFRESH_TOKEN_LIFETIME', 7 * 24 * 60 * 60)
+)
+
+# Password hashing of logins and registrations runs in a pool of this many
+# threads per process, 0 to hash in the request thread. Beyond
+# PASSWORD_HASHING_QUEUE waiting hashes, or after waiting
+# PASSWORD_HASHING_TIMEOUT seconds, requests get a 503.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', 8))
+PASSWORD_HASHING_TIMEOUT = int(os.environ.get('PASSWORD_HASHING_TIMEOUT', 10))
+
+RECIPE_LIST_CACHE_TIMEOUT = int(os.environ.get('RECIPE_LIST_CACHE_TIMEOUT', 60))
+
+# Render list endpoints from values() rows instead of the serializers.
+RECIPE_FAST_LIST_SERIALIZATION = bool(
+    int(os.environ.get('RECIPE_FAST_LIST_SERIALIZATION', 0))
+)
+
+# Limits of recipe image uploads, see recipe/uploads.py. The byte limit
+# matches client_max_body_size of the proxy. RECIPE_IMAGE_QUOTA_BYTES caps the
+# images stored by each user, 0 for no quota.
+RECIPE_IMAGE_MAX_BYTES = int(
+    os.environ.get('RECIPE_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+)
+RECIPE_IMAGE_QUOTA_BYTES = int(
+    os.environ.get('RECIPE_IMAGE_QUOTA_BYTES', 100 * 1024 * 1024)
+)
+# Store uploads once per distinct content, named by their SHA-256.
+RECIPE_IMAGE_CONTENT_ADDRESSED = bool(
+    int(os.environ.get('RECIPE_IMAGE_CONTENT_ADDRESSED', 0))
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -151,6 +244,8 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
 }
 
 SPECTACULAR_SETTINGS = {
@@ -0,0 +1,27 @@
+"""
+Test runner for the project.
+"""
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+        'TIMEOUT': 300,
+    }
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Run the tests against a cache of their own."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_settings = override_settings(CACHES=TEST_CACHES)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        super().teardown_test_environment(**kwargs)
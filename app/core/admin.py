@@ -47,3 +47,6 @@ admin.site.register(models.User, userAdmin)
 admin.site.register(models.Recipe)
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
+admin.site.register(models.ImageJob)
+admin.site.register(models.StoredImage)
+admin.site.register(models.ImportCheckpoint)
@@ -0,0 +1,157 @@
+"""
+Django command to benchmark recipe reads during a login storm.
+"""
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from rest_framework.test import (
+    APIRequestFactory,
+    force_authenticate,
+)
+
+from core.models import Recipe
+from recipe.views import RecipeViewSet
+from user.views import CreateTokenView
+
+
+EMAIL = 'benchmark-logins@example.com'
+PASSWORD = 'benchmark-password'
+
+
+class UncachedRecipeViewSet(RecipeViewSet):
+    """Recipe views which render every list instead of caching it."""
+    list_cache_timeout = 0
+
+
+class Command(BaseCommand):
+    """Django command to measure the cost of logins on recipe reads."""
+    help = (
+        'Read the recipe list from several threads, alone and then during a '
+        'storm of logins hashed in the request thread and in the hashing '
+        'pool, and report logins/sec and the read latency. The benchmark '
+        'user is committed, since every thread has its own connection, and '
+        'deleted at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--login-threads', type=int, default=16)
+        parser.add_argument('--recipes', type=int, default=50)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        get_user_model().objects.filter(email=EMAIL).delete()
+        self.user = get_user_model().objects.create_user(
+            email=EMAIL,
+            password=PASSWORD,
+        )
+        try:
+            Recipe.objects.bulk_create([
+                Recipe(
+                    user=self.user,
+                    title=f'Recipe {i}',
+                    time_minutes=10,
+                    price=Decimal('5.00'),
+                )
+                for i in range(options['recipes'])
+            ])
+            modes = [
+                ('no logins', 0, {}),
+                ('request thread', options['login_threads'], {
+                    'PASSWORD_HASHING_WORKERS': 0,
+                }),
+                ('hashing pool', options['login_threads'], {}),
+            ]
+            for name, login_threads, overrides in modes:
+                # The request factory uses the "testserver" host.
+                with override_settings(
+                    ALLOWED_HOSTS=['testserver'],
+                    **overrides,
+                ):
+                    self.report(name, self.run(
+                        options['duration'],
+                        options['readers'],
+                        login_threads,
+                    ))
+        finally:
+            self.user.delete()
+
+    def run(self, duration, readers, login_threads):
+        """Run the readers and logins for duration seconds."""
+        factory = APIRequestFactory()
+        read_view = UncachedRecipeViewSet.as_view({'get': 'list'})
+        login_view = CreateTokenView.as_view()
+        deadline = time.perf_counter() + duration
+        results = {'reads': [], 'logins': 0, 'rejected': 0}
+        lock = threading.Lock()
+
+        def read():
+            timings = []
+            while time.perf_counter() < deadline:
+                request = factory.get('/api/recipe/recipes/')
+                force_authenticate(request, self.user)
+                start = time.perf_counter()
+                read_view(request).render()
+                timings.append((time.perf_counter() - start) * 1000)
+            with lock:
+                results['reads'].extend(timings)
+
+        def login():
+            logins = rejected = 0
+            while time.perf_counter() < deadline:
+                response = login_view(factory.post(
+                    '/api/user/token/',
+                    {'email': EMAIL, 'password': PASSWORD},
+                    format='json',
+                ))
+                if response.status_code == 200:
+                    logins += 1
+                else:
+                    rejected += 1
+            with lock:
+                results['logins'] += logins
+                results['rejected'] += rejected
+
+        def close_connection(target):
+            def run():
+                try:
+                    target()
+                finally:
+                    connection.close()
+            return run
+
+        threads = [
+            threading.Thread(target=close_connection(read))
+            for _ in range(readers)
+        ] + [
+            threading.Thread(target=close_connection(login))
+            for _ in range(login_threads)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results['elapsed'] = time.perf_counter() - start
+
+        return results
+
+    def report(self, name, results):
+        """Write the throughput and latency of a run."""
+        reads = sorted(results['reads'])
+        p99 = reads[min(len(reads) - 1, int(len(reads) * 0.99))]
+        self.stdout.write(
+            f'{name}: {results["logins"] / results["elapsed"]:.1f} logins/s '
+            f'({results["rejected"]} rejected), '
+            f'{len(reads) / results["elapsed"]:.1f} reads/s, '
+            f'read p50 {statistics.median(reads):.1f} ms, '
+            f'p99 {p99:.1f} ms'
+        )
@@ -0,0 +1,121 @@
+"""
+Django command to benchmark recipe full text search.
+"""
+import random
+import statistics
+import string
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import Q
+
+from core.models import Recipe
+from recipe.filters import search_recipes
+
+
+VOCABULARY_SIZE = 20000
+
+
+def build_vocabulary(rng, size=VOCABULARY_SIZE):
+    """Return a list of random pseudo words."""
+    return [
+        ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+        for _ in range(size)
+    ]
+
+
+def percentile(values, fraction):
+    """Return the given percentile of a list of values."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    """Django command to compare full text search with icontains."""
+    help = (
+        'Seed recipes inside a transaction, time full text search against '
+        'an icontains baseline and roll everything back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = random.Random(options['seed'])
+        words = build_vocabulary(rng)
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email='benchmark-search@example.com',
+                password=None,
+            )
+            self.seed(user, options, words, rng)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT gin_clean_pending_list('recipe_search_idx')"
+                )
+                cursor.execute('ANALYZE core_recipe')
+
+            base = Recipe.objects.filter(user=user)
+            terms = rng.sample(words, options['repeat'])
+            search = self.measure(
+                lambda term: search_recipes(base, term).order_by(
+                    '-rank', '-id')[:100],
+                terms,
+            )
+            baseline = self.measure(
+                lambda term: base.filter(
+                    Q(title__icontains=term) | Q(description__icontains=term)
+                ).order_by('-id')[:100],
+                terms,
+            )
+
+            self.report('full text search', search)
+            self.report('icontains', baseline)
+            transaction.set_rollback(True)
+
+    def seed(self, user, options, words, rng):
+        """Insert the benchmark recipes in batches."""
+        count = options['recipes']
+        batch_size = options['batch_size']
+        self.stdout.write(f'Seeding {count} recipes...')
+        for start in range(0, count, batch_size):
+            Recipe.objects.bulk_create([
+                Recipe(
+                    user=user,
+                    title=' '.join(rng.sample(words, 3)),
+                    description=' '.join(rng.choices(words, k=30)),
+                    time_minutes=rng.randint(5, 120),
+                    price=Decimal('5.00'),
+                )
+                for _ in range(min(batch_size, count - start))
+            ])
+
+    def measure(self, build_queryset, terms):
+        """Return the latency in milliseconds of each query."""
+        timings = []
+        for term in terms:
+            queryset = build_queryset(term)
+            start = time.perf_counter()
+            list(queryset)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return timings
+
+    def report(self, label, timings):
+        """Write the latency summary of a benchmark."""
+        self.stdout.write(
+            f'{label}: median {statistics.median(timings):.2f} ms, '
+            f'p95 {percentile(timings, 0.95):.2f} ms, '
+            f'max {max(timings):.2f} ms'
+        )
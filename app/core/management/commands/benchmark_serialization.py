@@ -0,0 +1,136 @@
+"""
+Django command to benchmark the recipe list serialization paths.
+"""
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import transaction
+from django.db.models import Prefetch
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe import fast
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """Django command to compare the serializer and fast list paths."""
+    help = (
+        'Seed recipes inside a transaction, render them with RecipeSerializer '
+        'and with the fast path, and roll everything back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--related', type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email='benchmark-serialization@example.com',
+                password=None,
+            )
+            self.seed(user, max(options['rows']), options['related'])
+
+            for rows in options['rows']:
+                ids = list(Recipe.objects.filter(user=user).order_by(
+                    '-id').values_list('id', flat=True)[:rows])
+                queryset = Recipe.objects.filter(id__in=ids).order_by('-id')
+                slow_body, slow = self.measure(
+                    lambda: self.render_serializer(queryset),
+                    options['repeat'],
+                )
+                fast_body, quick = self.measure(
+                    lambda: self.render_fast(queryset),
+                    options['repeat'],
+                )
+                if slow_body != fast_body:
+                    raise CommandError(f'Output differs at {rows} rows.')
+
+                self.stdout.write(
+                    f'{rows} rows: serializer {slow:.1f} ms, '
+                    f'fast {quick:.1f} ms ({slow / quick:.1f}x), '
+                    f'{len(fast_body)} bytes'
+                )
+
+            transaction.set_rollback(True)
+
+    def seed(self, user, count, related):
+        """Insert recipes with tags and ingredients."""
+        self.stdout.write(f'Seeding {count} recipes...')
+        tags = Tag.objects.bulk_create([
+            Tag(user=user, name=f'Tag {i}') for i in range(50)
+        ])
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(user=user, name=f'Ingredient {i}') for i in range(200)
+        ])
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=i % 120,
+                price=Decimal(i % 10000) / 100,
+                link='https://example.com/recipe.pdf',
+            )
+            for i in range(count)
+        ], batch_size=5000)
+
+        recipe_tags = Recipe.tags.through
+        recipe_ingredients = Recipe.ingredients.through
+        recipe_tags.objects.bulk_create([
+            recipe_tags(recipe=recipe, tag=tags[(i + k) % len(tags)])
+            for i, recipe in enumerate(recipes) for k in range(related)
+        ], batch_size=5000)
+        recipe_ingredients.objects.bulk_create([
+            recipe_ingredients(
+                recipe=recipe,
+                ingredient=ingredients[(i + k) % len(ingredients)],
+            )
+            for i, recipe in enumerate(recipes) for k in range(related)
+        ], batch_size=5000)
+
+    def render_serializer(self, queryset):
+        """Render the recipes with RecipeSerializer."""
+        queryset = queryset.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.order_by('id'),
+            ),
+        )
+        data = RecipeSerializer(queryset, many=True).data
+        return JSONRenderer().render(data)
+
+    def render_fast(self, queryset):
+        """Render the recipes with the fast path."""
+        fields = RecipeSerializer.Meta.fields
+        rows = fast.recipe_values(queryset, fields)
+        return JSONRenderer().render(fast.build_recipes(rows, fields))
+
+    def measure(self, render, repeat):
+        """Return the output and median time in milliseconds of a render."""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = render()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return body, statistics.median(timings)
@@ -0,0 +1,170 @@
+"""
+Django command to delete recipe image files no longer referenced.
+"""
+import os
+import time
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import (
+    Exists,
+    OuterRef,
+)
+from django.utils import timezone
+
+from core.models import (
+    ImageJob,
+    Recipe,
+    StoredImage,
+)
+from recipe import images
+
+
+UPLOADS = os.path.join('uploads', 'recipe')
+
+
+def referenced_paths(batch_size):
+    """Return the set of every path the database refers to."""
+    paths = set()
+    # Server side cursors, so the tables are never all in memory at once.
+    for image, thumbnail, renditions in Recipe.objects.values_list(
+        'image', 'thumbnail', 'renditions',
+    ).iterator(chunk_size=batch_size):
+        paths.update([image, thumbnail])
+        paths.update(rendition['path'] for rendition in renditions.values())
+    # Stored images are kept until their row is deleted, as an upload may
+    # start using one again at any time.
+    paths.update(StoredImage.objects.values_list(
+        'image', flat=True,
+    ).iterator(chunk_size=batch_size))
+    paths.update(ImageJob.objects.values_list(
+        'source', flat=True,
+    ).iterator(chunk_size=batch_size))
+    paths.discard(None)
+    paths.discard('')
+
+    return paths
+
+
+def scan_files(directory, prefix):
+    """Yield the storage paths and entries of the files under directory."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            path = f'{prefix}/{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_files(entry.path, path)
+            elif entry.is_file(follow_symlinks=False):
+                yield path, entry
+
+
+class Command(BaseCommand):
+    """Django command to collect orphaned recipe images."""
+    help = (
+        'Delete the stored images no recipe uses any more, then walk '
+        'uploads/recipe/ and delete the files which no recipe, stored image '
+        'or image job refers to and which were last modified more than '
+        '--grace-hours ago, so uploads in progress are kept. With --dry-run '
+        'nothing is deleted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be deleted without deleting it.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        start = time.perf_counter()
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        self.dry_run = options['dry_run']
+        verb = 'Would delete' if self.dry_run else 'Deleted'
+
+        stored_images = self.collect_stored_images(
+            cutoff,
+            options['batch_size'],
+        )
+        self.stdout.write(f'{verb} {stored_images} unused stored images.')
+
+        referenced = referenced_paths(options['batch_size'])
+        self.stdout.write(f'Loaded {len(referenced)} referenced paths.')
+        scanned, deleted, size = self.collect_files(
+            referenced,
+            cutoff.timestamp(),
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} of {scanned} files, '
+            f'{size / 2 ** 20:.1f} MB, in {elapsed:.1f} s '
+            f'({scanned / elapsed:.0f} files/s).'
+        ))
+
+    def collect_stored_images(self, cutoff, batch_size):
+        """Delete the stored images without recipes, return how many."""
+        unused = StoredImage.objects.filter(
+            ~Exists(Recipe.objects.filter(stored_image=OuterRef('pk'))),
+            ref_count=0,
+            created_at__lt=cutoff,
+        )
+        if self.dry_run:
+            return unused.count()
+
+        collected = 0
+        while True:
+            # Uploads lock a stored image while they start using it.
+            with transaction.atomic():
+                batch = list(unused.select_for_update(
+                    skip_locked=True,
+                ).values_list('pk', 'image')[:batch_size])
+                StoredImage.objects.filter(
+                    pk__in=[pk for pk, image in batch],
+                ).delete()
+
+            for pk, image in batch:
+                default_storage.delete(image)
+                for name, (size, crop, image_format) in (
+                    images.RENDITIONS.items()
+                ):
+                    default_storage.delete(
+                        images.rendition_path(image, name, image_format),
+                    )
+            collected += len(batch)
+            if len(batch) < batch_size:
+                return collected
+
+    def collect_files(self, referenced, cutoff):
+        """Delete the old unreferenced files, return how many and how big."""
+        scanned = deleted = size = 0
+        directory = default_storage.path(UPLOADS)
+        if not os.path.isdir(directory):
+            return scanned, deleted, size
+
+        # Emptied directories are kept, the fan out bounds their number.
+        for path, entry in scan_files(directory, UPLOADS):
+            scanned += 1
+            if scanned % 100000 == 0:
+                self.stderr.write(f'Scanned {scanned} files')
+            if path in referenced:
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime >= cutoff:
+                continue
+
+            if not self.dry_run:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+            deleted += 1
+            size += stat.st_size
+
+        return scanned, deleted, size
@@ -0,0 +1,151 @@
+"""
+Django command to print the query plans of the recipe API queries.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+)
+
+from rest_framework.test import (
+    APIRequestFactory,
+    force_authenticate,
+)
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe import views
+
+
+# The API is called in-process, so bypass the host check and the response
+# cache to make sure every query actually runs.
+EXPLAIN_SETTINGS = {
+    'ALLOWED_HOSTS': ['*'],
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    },
+}
+
+
+class Command(BaseCommand):
+    """Django command to EXPLAIN every query issued by the list APIs."""
+    help = (
+        'Call the recipe, tag and ingredient list APIs as the given user and '
+        'print the EXPLAIN plan of every SELECT they run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='User to run the API queries as (default: first user).',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run EXPLAIN ANALYZE instead of EXPLAIN.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = self.get_user(options['email'])
+        explain = 'EXPLAIN (ANALYZE, BUFFERS)' if options['analyze'] \
+            else 'EXPLAIN'
+
+        with override_settings(**EXPLAIN_SETTINGS):
+            for label, view, params in self.get_scenarios(user):
+                self.stdout.write(self.style.MIGRATE_HEADING(f'== {label}'))
+                for sql in self.capture_queries(view, user, params):
+                    self.stdout.write(sql)
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'{explain} {sql}')
+                        for row in cursor.fetchall():
+                            self.stdout.write(f'    {row[0]}')
+                    self.stdout.write('')
+
+    def get_user(self, email):
+        """Return the user to run the queries as."""
+        users = get_user_model().objects.order_by('id')
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError('No matching user found.')
+
+        return user
+
+    def get_scenarios(self, user):
+        """Return the API calls to explain, using the user's own data."""
+        recipe_list = views.RecipeViewSet.as_view({'get': 'list'})
+        tag_list = views.TagViewSet.as_view({'get': 'list'})
+        ingredient_list = views.IngredientViewSet.as_view({'get': 'list'})
+
+        scenarios = [
+            ('recipes', recipe_list, {}),
+            ('tags', tag_list, {}),
+            ('tags assigned_only', tag_list, {'assigned_only': 1}),
+            ('ingredients', ingredient_list, {}),
+            (
+                'ingredients assigned_only',
+                ingredient_list,
+                {'assigned_only': 1},
+            ),
+        ]
+
+        tag_ids = list(Tag.objects.filter(user=user).values_list(
+            'id', flat=True)[:2])
+        ingredient_ids = list(Ingredient.objects.filter(
+            user=user).values_list('id', flat=True)[:2])
+        if tag_ids:
+            tags = ','.join(str(tag_id) for tag_id in tag_ids)
+            scenarios += [
+                ('recipes by tags', recipe_list, {'tags': tags}),
+                (
+                    'recipes by all tags',
+                    recipe_list,
+                    {'tags': tags, 'match': 'all'},
+                ),
+            ]
+        if ingredient_ids:
+            ingredients = ','.join(str(pk) for pk in ingredient_ids)
+            scenarios.append((
+                'recipes by ingredients',
+                recipe_list,
+                {'ingredients': ingredients},
+            ))
+
+        title = Recipe.objects.filter(user=user).values_list(
+            'title', flat=True).first()
+        if title and title.split():
+            scenarios.append((
+                'recipes search',
+                recipe_list,
+                {'search': title.split()[0]},
+            ))
+
+        return scenarios
+
+    def capture_queries(self, view, user, params):
+        """Call the view and return the SELECT statements it ran."""
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as context:
+            response = view(request)
+            response.render()
+
+        if response.status_code != 200:
+            raise CommandError(
+                f'API call failed with status {response.status_code}.'
+            )
+
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
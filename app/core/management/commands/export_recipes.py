@@ -0,0 +1,113 @@
+"""
+Django command to export recipes as NDJSON.
+"""
+import gzip
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import fast
+
+
+EXPORT_FIELDS = ['title', 'description', 'time_minutes', 'price', 'link']
+
+
+def open_output(path, compress):
+    """Return a text file to write the export to."""
+    if path == '-':
+        if compress:
+            return gzip.open(sys.stdout.buffer, 'wt', encoding='utf-8')
+        return open(sys.stdout.fileno(), 'w', encoding='utf-8', closefd=False)
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8')
+
+    return open(path, 'w', encoding='utf-8')
+
+
+def iter_records(queryset, chunk_size):
+    """Yield one export record per recipe, reading chunk_size at a time."""
+    rows = queryset.order_by('id').values(
+        'id',
+        'user__email',
+        *EXPORT_FIELDS,
+    ).iterator(chunk_size=chunk_size)
+
+    for chunk in fast.iter_chunks(rows, chunk_size):
+        ids = [row['id'] for row in chunk]
+        related = {
+            name: fast.related_items(name, ids)
+            for name in fast.RELATED_FIELDS
+        }
+        for row in chunk:
+            record = {'id': row['id'], 'user': row['user__email']}
+            record.update((name, row[name]) for name in EXPORT_FIELDS)
+            record['price'] = str(record['price'])
+            for name in fast.RELATED_FIELDS:
+                record[name] = [
+                    item['name'] for item in related[name].get(row['id'], [])
+                ]
+            yield record
+
+
+class Command(BaseCommand):
+    """Django command to export recipes as newline delimited JSON."""
+    help = (
+        'Write one JSON object per recipe, with its owner email and its tag '
+        'and ingredient names, reading the recipes through a server-side '
+        'cursor. Images are not exported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='File to write to, "-" for stdout (default).',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output. Implied by a .gz output file.',
+        )
+        parser.add_argument(
+            '--email',
+            action='append',
+            help='Only export recipes of this user, may be repeated.',
+        )
+        parser.add_argument(
+            '--after-id',
+            type=int,
+            default=0,
+            help='Only export recipes with a larger ID, to resume an export.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        queryset = Recipe.objects.filter(id__gt=options['after_id'])
+        if options['email']:
+            queryset = queryset.filter(user__email__in=options['email'])
+
+        path = options['output']
+        compress = options['gzip'] or path.endswith('.gz')
+        count = 0
+        last_id = options['after_id']
+        with open_output(path, compress) as output:
+            for record in iter_records(queryset, options['chunk_size']):
+                output.write(json.dumps(
+                    record,
+                    ensure_ascii=False,
+                    separators=(',', ':'),
+                ))
+                output.write('\n')
+                count += 1
+                last_id = record['id']
+                if count % options['chunk_size'] == 0:
+                    self.stderr.write(
+                        f'Exported {count} recipes (last ID {last_id})'
+                    )
+
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {count} recipes (last ID {last_id}).'
+        ))
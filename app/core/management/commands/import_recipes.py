@@ -0,0 +1,213 @@
+"""
+Django command to import recipes from NDJSON.
+"""
+import gzip
+import io
+import json
+import sys
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import (
+    connection,
+    transaction,
+)
+
+from core.models import (
+    ImportCheckpoint,
+    Recipe,
+)
+from recipe import fast
+from recipe.cache import bump_generation
+from recipe.serializers import resolve_by_name
+
+
+IMPORT_FIELDS = ['title', 'description', 'time_minutes', 'price', 'link']
+REQUIRED_FIELDS = ['user', 'title', 'time_minutes', 'price']
+
+
+def open_input(path, compress):
+    """Return a text file to read the import from."""
+    if path == '-':
+        if compress:
+            return gzip.open(sys.stdin.buffer, 'rt', encoding='utf-8')
+        return open(sys.stdin.fileno(), encoding='utf-8', closefd=False)
+    if compress:
+        return gzip.open(path, 'rt', encoding='utf-8')
+
+    return open(path, encoding='utf-8')
+
+
+def read_checkpoint(name):
+    """Return the number of lines already imported."""
+    if not name:
+        return 0
+
+    return ImportCheckpoint.objects.filter(name=name).values_list(
+        'lines', flat=True,
+    ).first() or 0
+
+
+def copy_related(field_name, user, recipes, names):
+    """Link the recipes to the user's tags or ingredients with COPY."""
+    field = Recipe._meta.get_field(field_name)
+    objects = resolve_by_name(field.related_model, user, [
+        name for recipe_names in names for name in recipe_names
+    ])
+    rows = io.StringIO()
+    for recipe, recipe_names in zip(recipes, names):
+        for name in dict.fromkeys(recipe_names):
+            rows.write(f'{recipe.id}\t{objects[name].id}\n')
+    if not rows.tell():
+        return
+
+    rows.seek(0)
+    quote = connection.ops.quote_name
+    through = field.remote_field.through
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote(through._meta.db_table)} '
+            f'({quote(field.m2m_column_name())}, '
+            f'{quote(field.m2m_reverse_name())}) FROM STDIN',
+            rows,
+        )
+
+
+class Command(BaseCommand):
+    """Django command to import recipes written by export_recipes."""
+    help = (
+        'Read one JSON object per line and insert the recipes in batches, '
+        'with bulk_create for the recipes and COPY for their tags and '
+        'ingredients. With --checkpoint, the number of imported lines is '
+        'saved in the transaction of each batch and a rerun resumes from '
+        'there.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            default='-',
+            help='File to read from, "-" for stdin (default).',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Decompress the input. Implied by a .gz input file.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Name under which the progress is saved in the database.',
+        )
+        parser.add_argument(
+            '--create-users',
+            action='store_true',
+            help='Create missing users, without a usable password.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        path = options['input']
+        checkpoint = options['checkpoint']
+        compress = options['gzip'] or path.endswith('.gz')
+        done = read_checkpoint(checkpoint)
+        if done:
+            self.stderr.write(f'Resuming after line {done}')
+
+        self.users = {}
+        imported = 0
+        with open_input(path, compress) as source:
+            lines = islice(source, done, None)
+            for batch in fast.iter_chunks(lines, options['batch_size']):
+                imported += self.import_batch(
+                    batch,
+                    done,
+                    options['create_users'],
+                    checkpoint,
+                )
+                done += len(batch)
+                self.stderr.write(
+                    f'Imported {imported} recipes (line {done})'
+                )
+
+        self.stderr.write(self.style.SUCCESS(
+            f'Imported {imported} recipes.'
+        ))
+
+    def parse(self, batch, offset):
+        """Return the records of a batch of lines."""
+        records = []
+        for number, line in enumerate(batch, start=offset + 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                raise CommandError(f'Invalid JSON on line {number}: {error}')
+            if not isinstance(record, dict) or any(
+                name not in record for name in REQUIRED_FIELDS
+            ):
+                raise CommandError(
+                    f'Line {number} must be an object with the fields '
+                    f'{", ".join(REQUIRED_FIELDS)}.'
+                )
+            records.append(record)
+
+        return records
+
+    def get_users(self, emails, create):
+        """Return the users of the emails, caching them across batches."""
+        missing = set(emails) - set(self.users)
+        for user in get_user_model().objects.filter(email__in=missing):
+            self.users[user.email] = user
+
+        for email in sorted(missing - set(self.users)):
+            if not create:
+                raise CommandError(
+                    f'User {email} does not exist, see --create-users.'
+                )
+            self.users[email] = get_user_model().objects.create_user(
+                email=email,
+                password=None,
+            )
+
+        return self.users
+
+    def import_batch(self, batch, offset, create_users, checkpoint=None):
+        """Insert the recipes of a batch of lines in one transaction."""
+        records = self.parse(batch, offset)
+        by_user = defaultdict(list)
+        for record in records:
+            by_user[record['user']].append(record)
+
+        with transaction.atomic():
+            users = self.get_users(by_user, create_users)
+            for email, user_records in by_user.items():
+                user = users[email]
+                recipes = Recipe.objects.bulk_create([
+                    Recipe(user=user, **{
+                        name: record[name]
+                        for name in IMPORT_FIELDS if name in record
+                    })
+                    for record in user_records
+                ])
+                for name in fast.RELATED_FIELDS:
+                    copy_related(name, user, recipes, [
+                        record.get(name, []) for record in user_records
+                    ])
+            # Committed with the recipes, so a rerun never inserts them twice.
+            if checkpoint:
+                ImportCheckpoint.objects.update_or_create(
+                    name=checkpoint,
+                    defaults={'lines': offset + len(batch)},
+                )
+
+        for email in by_user:
+            bump_generation(users[email].pk)
+
+        return len(records)
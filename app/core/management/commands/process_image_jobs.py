@@ -0,0 +1,59 @@
+"""
+Django command to render the renditions of uploaded recipe images.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Django command to run the image jobs."""
+    help = (
+        'Claim image jobs from the database and render their renditions. '
+        'Runs until stopped, or until no job is left with --once. Several '
+        'workers can run at once to use more CPUs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is available.',
+        )
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2,
+            help='Seconds to wait when no job is available.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        processed = failed = 0
+        while True:
+            jobs = images.claim_jobs(options['batch_size'])
+            for job in jobs:
+                try:
+                    images.process_job(job)
+                    processed += 1
+                except Exception as error:
+                    images.fail_job(job, error)
+                    failed += 1
+                    self.stderr.write(
+                        f'Job {job.pk} for {job.source} failed '
+                        f'(attempt {job.attempts}): {error}'
+                    )
+            if not jobs:
+                if options['once']:
+                    break
+                # Drop a broken connection instead of failing every poll.
+                close_old_connections()
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} image jobs, {failed} failed.'
+        ))
@@ -0,0 +1,265 @@
+"""
+Django command to move recipe images into sharded directories.
+"""
+import os
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import (
+    ImageJob,
+    Recipe,
+    StoredImage,
+    sharded_path,
+)
+from recipe import images
+from recipe.cache import (
+    bump_generation,
+    is_shared,
+)
+
+
+UPLOADS = os.path.join('uploads', 'recipe')
+# Originals written to uploads/recipe/ or uploads/recipe/sha256/ directly.
+FLAT_IMAGE = r'^uploads/recipe/(sha256/)?[^/]+$'
+FLAT_STORED_IMAGE = r'^uploads/recipe/sha256/[^/]+$'
+
+
+def sharded(path):
+    """Return where a file written before the fan out belongs now."""
+    parts = path.split('/') if path else []
+    if parts[:2] != ['uploads', 'recipe']:
+        return path
+
+    parts = parts[2:]
+    if len(parts) == 1:
+        return sharded_path(UPLOADS, parts[0])
+    if len(parts) == 2 and parts[0] == 'sha256':
+        return sharded_path(os.path.join(UPLOADS, 'sha256'), parts[1])
+    if len(parts) == 3 and parts[0] == 'renditions':
+        return os.path.join(
+            sharded_path(os.path.join(UPLOADS, 'renditions'), parts[1]),
+            parts[2],
+        )
+
+    return path
+
+
+def copy_file(old, new):
+    """Copy a file unless already copied, return whether the copy exists."""
+    if not default_storage.exists(old):
+        return default_storage.exists(new)
+    if default_storage.exists(new):
+        if default_storage.size(new) == default_storage.size(old):
+            return True
+        # Left over by an interrupted run.
+        default_storage.delete(new)
+
+    with default_storage.open(old) as original:
+        default_storage.save(new, original)
+
+    return True
+
+
+def delete_files(paths):
+    """Delete files, and the directories they leave empty."""
+    directories = set()
+    for path in paths:
+        default_storage.delete(path)
+        directories.add(os.path.dirname(path))
+
+    for directory in directories:
+        try:
+            os.rmdir(default_storage.path(directory))
+        except (NotImplementedError, OSError):
+            pass
+
+
+class Command(BaseCommand):
+    """Django command to fan out the recipe images written flat."""
+    help = (
+        'Move the recipe images and renditions written directly to '
+        'uploads/recipe/ into subdirectories named by the first characters '
+        'of their names, and rewrite their paths, in batches of '
+        '--batch-size recipes. Files are copied before the paths are '
+        'switched and deleted after, so they are served throughout. With a '
+        'cache local to each process, cached pages of other processes keep '
+        'the old paths, so the old files are only deleted once '
+        'RECIPE_LIST_CACHE_TIMEOUT has passed, and the command waits for '
+        'that at the end. Recipes with pending image jobs, and images '
+        'shared with them, are skipped; run the command again to move them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to wait between batches.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.moved = self.skipped = 0
+        self.pending = deque()
+        start = time.perf_counter()
+        self.move_recipes(options['batch_size'], options['sleep'])
+        self.move_stored_images(options['batch_size'], options['sleep'])
+        self.delete_expired(wait=True)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {self.moved} images, skipped {self.skipped}, '
+            f'{self.moved / elapsed:.1f} images/s.'
+        ))
+
+    def batches(self, queryset, batch_size, sleep, fields):
+        """Yield the rows of a queryset in batches, by primary key."""
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(
+                pk__gt=last_pk,
+            ).order_by('pk').values('pk', *fields)[:batch_size])
+            if not batch:
+                break
+            yield batch
+            self.delete_expired()
+
+            if len(batch) < batch_size:
+                break
+            last_pk = batch[-1]['pk']
+            self.stderr.write(f'Moved {self.moved} images')
+            time.sleep(sleep)
+
+    def delete_later(self, paths):
+        """Delete old files once no cached page can refer to them."""
+        paths = list(paths)
+        # Other processes only see the generation bump through a shared
+        # cache, until then their cached pages expire on their own.
+        if is_shared():
+            delete_files(paths)
+        else:
+            self.pending.append(
+                (time.monotonic() + settings.RECIPE_LIST_CACHE_TIMEOUT, paths),
+            )
+
+    def delete_expired(self, wait=False):
+        """Delete the old files whose cached pages expired."""
+        while self.pending:
+            deadline, paths = self.pending[0]
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                if not wait:
+                    return
+                self.stderr.write(
+                    f'Waiting {remaining:.0f} s for cached pages to expire',
+                )
+                time.sleep(remaining)
+            self.pending.popleft()
+            delete_files(paths)
+
+    def move_recipes(self, batch_size, sleep):
+        """Move the images and renditions of recipes."""
+        for batch in self.batches(
+            Recipe.objects.filter(image__regex=FLAT_IMAGE),
+            batch_size,
+            sleep,
+            ['user_id', 'image', 'thumbnail', 'renditions', 'stored_image_id'],
+        ):
+            # A job renders from its source path, which must not move.
+            pending = set(ImageJob.objects.filter(
+                recipe_id__in=[recipe['pk'] for recipe in batch],
+            ).values_list('recipe_id', flat=True))
+            for recipe in batch:
+                if recipe['pk'] not in pending and self.move_recipe(recipe):
+                    self.moved += 1
+                else:
+                    self.skipped += 1
+
+    def move_recipe(self, recipe):
+        """Move the files of a recipe, return whether it was moved."""
+        renditions = {
+            name: {**rendition, 'path': sharded(rendition['path'])}
+            for name, rendition in recipe['renditions'].items()
+        }
+        files = [(recipe['image'], sharded(recipe['image']))] + [
+            (rendition['path'], renditions[name]['path'])
+            for name, rendition in recipe['renditions'].items()
+        ]
+        if not all(copy_file(old, new) for old, new in files):
+            self.stderr.write(f'Recipe {recipe["pk"]} has missing files')
+            return False
+
+        # Not moved if the image was replaced in the meantime.
+        updated = Recipe.objects.filter(
+            pk=recipe['pk'],
+            image=recipe['image'],
+            thumbnail=recipe['thumbnail'],
+        ).update(
+            image=sharded(recipe['image']),
+            thumbnail=sharded(recipe['thumbnail']),
+            renditions=renditions,
+        )
+        if updated:
+            bump_generation(recipe['user_id'])
+        # Files of stored images may be shared, they are deleted with them.
+        if not recipe['stored_image_id']:
+            moved = [(old, new) for old, new in files if old != new]
+            if updated:
+                self.delete_later(old for old, new in moved)
+            else:
+                delete_files(new for old, new in moved)
+
+        return bool(updated)
+
+    def move_stored_images(self, batch_size, sleep):
+        """Move stored images once no recipe uses their old paths."""
+        for batch in self.batches(
+            StoredImage.objects.filter(image__regex=FLAT_STORED_IMAGE),
+            batch_size,
+            sleep,
+            ['image'],
+        ):
+            for stored_image in batch:
+                if self.move_stored_image(stored_image):
+                    self.moved += 1
+                else:
+                    self.skipped += 1
+
+    def move_stored_image(self, stored_image):
+        """Move a stored image, return whether it was moved."""
+        old = stored_image['image']
+        if not copy_file(old, sharded(old)):
+            self.stderr.write(f'Stored image {stored_image["pk"]} is missing')
+            return False
+
+        # Uploads lock the stored image until their recipe is saved.
+        with transaction.atomic():
+            locked = StoredImage.objects.select_for_update().filter(
+                pk=stored_image['pk'],
+                image=old,
+            ).values_list('pk', flat=True).first()
+            if locked is None or Recipe.objects.filter(
+                stored_image_id=stored_image['pk'],
+                image=old,
+            ).exists():
+                return False
+            StoredImage.objects.filter(pk=stored_image['pk']).update(
+                image=sharded(old),
+            )
+
+        stem = os.path.splitext(os.path.basename(old))[0]
+        self.delete_later([old] + [
+            os.path.join(
+                UPLOADS, 'renditions', stem,
+                f'{name}.{images.EXTENSIONS[image_format]}',
+            )
+            for name, (size, crop, image_format) in images.RENDITIONS.items()
+        ])
+
+        return True
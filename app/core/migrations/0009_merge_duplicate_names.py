@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:42
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Merge tags and ingredients sharing a user and name into the oldest."""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in [('Tag', 'tags'), ('Ingredient', 'ingredients')]:
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        target = f'{model_name.lower()}_id'
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep=Min('id'),
+            count=Count('id'),
+        ).filter(count__gt=1)
+
+        for duplicate in duplicates:
+            ids = list(model.objects.filter(
+                user=duplicate['user'],
+                name=duplicate['name'],
+            ).values_list('id', flat=True))
+            recipe_ids = set(through.objects.filter(**{
+                f'{target}__in': ids,
+            }).values_list('recipe_id', flat=True))
+
+            through.objects.filter(**{f'{target}__in': ids}).delete()
+            through.objects.bulk_create([
+                through(**{'recipe_id': recipe_id, target: duplicate['keep']})
+                for recipe_id in recipe_ids
+            ])
+            model.objects.filter(id__in=ids).exclude(
+                id=duplicate['keep'],
+            ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_api_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Build the index without locking the table against writes.
+    atomic = False
+
+    dependencies = [
+        ('authtoken', '0003_tokenproxy'),
+        ('core', '0011_user_tokens_valid_after'),
+    ]
+
+    operations = [
+        # Lets purge_tokens find the expired tokens of each batch without
+        # scanning the whole table.
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+            'authtoken_token_created_idx '
+            'ON authtoken_token (created);',
+            'DROP INDEX CONCURRENTLY IF EXISTS '
+            'authtoken_token_created_idx;',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:24
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def fill_image_sizes(apps, schema_editor):
+    """Record the size of the images already stored."""
+    Recipe = apps.get_model('core', 'Recipe')
+    recipes = Recipe.objects.exclude(image='').exclude(image__isnull=True)
+    for recipe in recipes.only('id', 'image').iterator():
+        if default_storage.exists(recipe.image.name):
+            Recipe.objects.filter(id=recipe.id).update(
+                image_size=default_storage.size(recipe.image.name),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_size',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_image_sizes, migrations.RunPython.noop),
+    ]
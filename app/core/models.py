@@ -6,7 +6,10 @@ import os # 124
 
 from django.conf import settings
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -14,6 +17,16 @@ from django.contrib.auth.models import (
 )
 
 
+def sharded_path(directory, name):
+    """
+    Return the path of name in directory, fanned out by its first characters.
+
+    Names must start with random or hashed characters, such as uuids, so
+    that each of the two levels of subdirectories gets a similar share.
+    """
+    return os.path.join(directory, name[:2], name[2:4], name)
+
+
 # 124 Modify recipe model
 # アップロードされた画像を拡張子だけ残して、ファイル名をuuid4で出力された16ビットのランダムな文字列にする。
 def recipe_image_file_path(instance, filename):
@@ -21,7 +34,18 @@ def recipe_image_file_path(instance, filename):
     ext = os.path.splitext(filename)[1] # 拡張子を取り出して
     filename = f'{uuid.uuid4()}{ext}' # uuid.uuid4でランダムに生成されたユニークな識別子（文字列）を取り出してファイル名にする。例：f1e6b391-3b9c-4a4c-8b9f-8c8f5db692d5
 
-    return os.path.join('uploads', 'recipe', filename)
+    # 1つのディレクトリに何百万ものファイルが入らないように、uuidの先頭の文字でサブディレクトリに分ける。例：uploads/recipe/f1/e6/f1e6b391-...jpg
+    return sharded_path(os.path.join('uploads', 'recipe'), filename)
+
+
+def stored_image_file_path(instance, filename):
+    """Generate file path for an image stored under its content hash."""
+    ext = os.path.splitext(filename)[1].lower()
+
+    return sharded_path(
+        os.path.join('uploads', 'recipe', 'sha256'),
+        f'{instance.sha256}{ext}',
+    )
 
 
 class UserManager(BaseUserManager):
@@ -54,6 +78,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     name =models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Signed tokens issued until then are rejected, see user/tokens.py.
+    tokens_valid_after = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
@@ -73,6 +99,26 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
 
     image = models.ImageField(null=True, upload_to=recipe_image_file_path) # 124 Modify recipe model
+    # Bytes of the image, counted against the storage quota of the user.
+    image_size = models.PositiveIntegerField(default=0, editable=False)
+    # Set when the image is content addressed, image then names its file.
+    stored_image = models.ForeignKey(
+        'StoredImage',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.PROTECT,
+        related_name='recipes',
+    )
+    # Written by the image jobs once the renditions of the image are ready,
+    # see recipe/images.py. The thumbnail is kept apart for the list views.
+    thumbnail = models.ImageField(
+        max_length=255,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     # 90 Add tag model
     tags = models.ManyToManyField('Tag')
@@ -80,10 +126,89 @@ class Recipe(models.Model):
     # 105 で追加
     ingredients = models.ManyToManyField('Ingredient')
 
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Maintained by a database trigger from title (weight A) and
+    # description (weight B), see migration 0007.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+            # WHERE user_id = ? ORDER BY id DESC
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 
+class StoredImage(models.Model):
+    """Image file shared by every recipe with the same content."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    image = models.ImageField(upload_to=stored_image_file_path)
+    size = models.PositiveIntegerField()
+    # Number of recipes using the image, see recipe/images.py. Images left
+    # without references are deleted by the garbage collector.
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
+class ImageJob(models.Model):
+    """Job rendering the renditions of a recipe image."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        RUNNING = 'running'
+        FAILED = 'failed'
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+    )
+    # Name of the image the job was created for. The job is dropped if the
+    # recipe has another image by the time it runs.
+    source = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    # When a pending job may run, or when the lease of a running job ends.
+    available_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # WHERE status IN (...) AND available_at <= ?
+            models.Index(
+                fields=['status', 'available_at'],
+                name='imagejob_status_available_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.source} ({self.status})'
+
+
+class ImportCheckpoint(models.Model):
+    """Progress of a resumable recipe import."""
+    name = models.CharField(max_length=255, unique=True)
+    # Lines of the input imported so far, written in the transaction of
+    # the batch which imported them.
+    lines = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} (line {self.lines})'
+
+
 # 90 Add tag model
 class Tag(models.Model):
     """Tag for filtering recipes."""
@@ -92,6 +217,17 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also serves WHERE user_id = ? ORDER BY name DESC, id DESC, as
+            # the names of a user are unique.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='tag_user_name_unique',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -105,6 +241,17 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also serves WHERE user_id = ? ORDER BY name DESC, id DESC, as
+            # the names of a user are unique.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='ingredient_user_name_unique',
+            ),
+        ]
 
     def __str__(self):
         return self.name
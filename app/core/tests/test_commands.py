@@ -1,13 +1,36 @@
 """
 Test custom Django management commands.
 """
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core.models import (
+    ImportCheckpoint,
+    Recipe,
+    Tag,
+    Ingredient,
+)
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +55,305 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test benchmark commands."""
+
+    def test_benchmark_search(self):
+        """Test the search benchmark reports both queries and cleans up."""
+        out = StringIO()
+
+        call_command('benchmark_search', recipes=50, repeat=3, stdout=out)
+
+        self.assertIn('full text search', out.getvalue())
+        self.assertIn('icontains', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_explain_api_queries(self):
+        """Test EXPLAIN plans are printed for each API query."""
+        user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Chicken curry',
+            time_minutes=10,
+            price='5.00',
+        )
+        recipe.tags.add(Tag.objects.create(user=user, name='Dinner'))
+        out = StringIO()
+
+        call_command('explain_api_queries', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('== recipes by all tags', output)
+        self.assertIn('== tags assigned_only', output)
+        self.assertIn('== recipes search', output)
+        self.assertIn('core_recipe_tags', output)
+        self.assertIn('Scan', output)
+
+    def test_benchmark_serialization(self):
+        """Test the serialization benchmark compares both paths."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_serialization',
+            rows=[20],
+            repeat=1,
+            stdout=out,
+        )
+
+        self.assertIn('20 rows: serializer', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_uploads(self):
+        """Test the upload benchmark compares both upload handlers."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_uploads',
+            uploads=2,
+            width=20,
+            height=20,
+            stdout=out,
+        )
+
+        self.assertIn('streaming: peak RSS', out.getvalue())
+        self.assertIn('default: peak RSS', out.getvalue())
+
+
+class BenchmarkLoginsCommandTests(TransactionTestCase):
+    """Test the login storm benchmark, whose threads need committed data."""
+
+    def test_benchmark_logins(self):
+        """Test the benchmark reports every mode and cleans up."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_logins',
+            duration=0.2,
+            readers=1,
+            login_threads=1,
+            recipes=2,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        for mode in ['no logins', 'request thread', 'hashing pool']:
+            self.assertIn(f'{mode}: ', output)
+        self.assertIn('logins/s', output)
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class RecipeTransferCommandTests(TestCase):
+    """Test the NDJSON export and import commands."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                description='Sample description',
+                time_minutes=10 + i,
+                price='5.50',
+                link='https://example.com/recipe.pdf',
+            )
+            for name in ['Vegan', f'Tag {i % 2}']:
+                tag, _ = Tag.objects.get_or_create(user=self.user, name=name)
+                recipe.tags.add(tag)
+            salt, _ = Ingredient.objects.get_or_create(
+                user=self.user,
+                name='Salt',
+            )
+            recipe.ingredients.add(salt)
+
+    def path(self, name):
+        """Return a path in the temporary directory."""
+        return os.path.join(self.tmp.name, name)
+
+    def export(self, name, **options):
+        """Export the recipes and return the records."""
+        path = self.path(name)
+        call_command(
+            'export_recipes',
+            output=path,
+            chunk_size=2,
+            stderr=StringIO(),
+            **options,
+        )
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as export:
+            return [json.loads(line) for line in export]
+
+    def test_export_recipes(self):
+        """Test every recipe is exported with its tags and ingredients."""
+        records = self.export('recipes.ndjson')
+
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[1], {
+            'id': records[1]['id'],
+            'user': 'user@example.com',
+            'title': 'Recipe 1',
+            'description': 'Sample description',
+            'time_minutes': 11,
+            'price': '5.50',
+            'link': 'https://example.com/recipe.pdf',
+            'tags': ['Vegan', 'Tag 1'],
+            'ingredients': ['Salt'],
+        })
+        after = self.export('rest.ndjson', after_id=records[2]['id'])
+        self.assertEqual(after, records[3:])
+
+    def test_import_round_trip(self):
+        """Test importing an export recreates the same recipes."""
+        records = self.export('recipes.ndjson.gz')
+        Recipe.objects.all().delete()
+        Tag.objects.filter(name='Tag 1').delete()
+
+        call_command(
+            'import_recipes',
+            input=self.path('recipes.ndjson.gz'),
+            batch_size=2,
+            stderr=StringIO(),
+        )
+
+        imported = self.export('again.ndjson')
+        strip = [{**record, 'id': None} for record in records]
+        self.assertEqual([{**r, 'id': None} for r in imported], strip)
+        self.assertEqual(Tag.objects.filter(name='Vegan').count(), 1)
+
+    def test_import_resumes_from_checkpoint(self):
+        """Test an import skips the lines recorded in the checkpoint."""
+        self.export('recipes.ndjson')
+        Recipe.objects.all().delete()
+        ImportCheckpoint.objects.create(name='recipes', lines=3)
+
+        call_command(
+            'import_recipes',
+            input=self.path('recipes.ndjson'),
+            checkpoint='recipes',
+            batch_size=1,
+            stderr=StringIO(),
+        )
+
+        titles = Recipe.objects.order_by('id').values_list('title', flat=True)
+        self.assertEqual(list(titles), ['Recipe 3', 'Recipe 4'])
+        self.assertEqual(ImportCheckpoint.objects.get().lines, 5)
+
+    def test_import_checkpoint_in_batch_transaction(self):
+        """Test a batch and its checkpoint are committed together."""
+        self.export('recipes.ndjson')
+        Recipe.objects.all().delete()
+        update_or_create = ImportCheckpoint.objects.update_or_create
+        calls = []
+
+        def crash_on_second_batch(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 2:
+                raise OperationalError('server closed the connection')
+            return update_or_create(**kwargs)
+
+        with patch.object(
+            ImportCheckpoint.objects,
+            'update_or_create',
+            side_effect=crash_on_second_batch,
+        ), self.assertRaises(OperationalError):
+            call_command(
+                'import_recipes',
+                input=self.path('recipes.ndjson'),
+                checkpoint='recipes',
+                batch_size=2,
+                stderr=StringIO(),
+            )
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get().lines, 2)
+
+        call_command(
+            'import_recipes',
+            input=self.path('recipes.ndjson'),
+            checkpoint='recipes',
+            batch_size=2,
+            stderr=StringIO(),
+        )
+
+        titles = Recipe.objects.order_by('id').values_list('title', flat=True)
+        self.assertEqual(list(titles), [f'Recipe {i}' for i in range(5)])
+
+    def test_import_unknown_user(self):
+        """Test unknown users are an error unless they may be created."""
+        path = self.path('other.ndjson')
+        with open(path, 'w') as f:
+            f.write(json.dumps({
+                'user': 'new@example.com',
+                'title': 'Imported',
+                'time_minutes': 5,
+                'price': '1.00',
+                'tags': ['Quick', 'Quick'],
+            }) + '\n')
+
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', input=path, stderr=StringIO())
+        call_command(
+            'import_recipes',
+            input=path,
+            create_users=True,
+            stderr=StringIO(),
+        )
+
+        recipe = Recipe.objects.get(title='Imported')
+        self.assertEqual(recipe.user.email, 'new@example.com')
+        self.assertFalse(recipe.user.has_usable_password())
+        self.assertEqual(
+            list(recipe.tags.values_list('name', flat=True)),
+            ['Quick'],
+        )
+
+    def test_import_invalid_line(self):
+        """Test an invalid line stops the import with its line number."""
+        path = self.path('invalid.ndjson')
+        with open(path, 'w') as f:
+            f.write('{"user": "user@example.com"}\n')
+
+        with self.assertRaisesMessage(CommandError, 'Line 1'):
+            call_command('import_recipes', input=path, stderr=StringIO())
+
+
+@override_settings(TOKEN_TTL=3600)
+class PurgeTokensCommandTests(TestCase):
+    """Test the purge_tokens command."""
+
+    def create_token(self, email, age):
+        """Create a token last used age seconds ago."""
+        user = get_user_model().objects.create_user(email=email)
+        token = Token.objects.create(user=user)
+        Token.objects.filter(pk=token.pk).update(
+            created=timezone.now() - timedelta(seconds=age),
+        )
+
+        return token
+
+    def test_purge_tokens(self):
+        """Test expired tokens are deleted in batches."""
+        for i in range(5):
+            self.create_token(f'expired{i}@example.com', 3601)
+        fresh = self.create_token('fresh@example.com', 600)
+        out = StringIO()
+
+        call_command('purge_tokens', batch_size=2, stdout=out, stderr=out)
+
+        self.assertEqual(list(Token.objects.all()), [fresh])
+        self.assertIn('Purged 5 tokens.', out.getvalue())
+
+    @override_settings(TOKEN_TTL=0)
+    def test_purge_tokens_without_expiry(self):
+        """Test the command refuses to run if tokens do not expire."""
+        with self.assertRaisesMessage(CommandError, 'TOKEN_TTL'):
+            call_command('purge_tokens')
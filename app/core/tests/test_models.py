@@ -4,6 +4,10 @@ Tests for models
 from unittest.mock import patch
 from decimal import Decimal # Recipeオブジェクトのフィールドの1つに使用
 
+from django.db import (
+    IntegrityError,
+    transaction,
+)
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -94,6 +98,17 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_names_unique_per_user(self):
+        """Test a user cannot have two tags or ingredients of one name."""
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+        for model in [models.Tag, models.Ingredient]:
+            model.objects.create(user=user, name='Salt')
+            model.objects.create(user=other_user, name='Salt')
+
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                model.objects.create(user=user, name='Salt')
+
     # 124 Modify recipe model
     @patch('core.models.uuid.uuid4') # 指定したパスの関数（uuid.uuid4）を一時的にモック板に入れ替える
     def test_recipe_file_name_uuid(self, mock_uuid):
@@ -109,4 +124,4 @@ class ModelTests(TestCase):
         mock_uuid.return_value = uuid # これがmockオブジェクト。return_value属性をつけると自動的に@Patchで指定した関数のmockオブジェクトになるらしい。むずすぎる。
         file_path = models.recipe_image_file_path(None, 'example.jpg')
 
-        self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+        self.assertEqual(file_path, f'uploads/recipe/te/st/{uuid}.jpg')
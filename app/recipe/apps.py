@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        """Connect the image signals and register the checks."""
+        from recipe import (  # noqa: F401
+            checks,
+            images,
+        )
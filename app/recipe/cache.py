@@ -0,0 +1,178 @@
+"""
+Response cache and conditional requests for the recipe APIs.
+
+Cached pages are keyed by user, generation and normalized query params.
+Each user has a generation counter which is bumped after every successful
+write to the recipe APIs, so stale pages are never read again and simply
+age out of the cache. The generation is the time of the last write in
+nanoseconds, which also gives the ETag of the responses without touching
+the database.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import (
+    cache,
+    caches,
+)
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import get_conditional_response
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+
+GENERATION_KEY = 'recipe:generation:{user_id}'
+LIST_KEY = 'recipe:list:{user_id}:{generation}:{digest}'
+HITS_KEY = 'recipe:list-cache:hits'
+MISSES_KEY = 'recipe:list-cache:misses'
+
+
+def _incr(key):
+    """Increment a counter, creating it if needed."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def is_shared():
+    """Return whether the cache is shared by every process of the app."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def get_generation(user_id):
+    """Return the cache generation of a user."""
+    key = GENERATION_KEY.format(user_id=user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from the clock so an evicted counter never goes back to a
+        # value which was already used for cached pages.
+        generation = time.time_ns()
+        if not cache.add(key, generation, timeout=None):
+            generation = cache.get(key) or generation
+
+    return generation
+
+
+def bump_generation(user_id):
+    """Invalidate every cached page of a user."""
+    key = GENERATION_KEY.format(user_id=user_id)
+    generation = max(time.time_ns(), (cache.get(key) or 0) + 1)
+    cache.set(key, generation, timeout=None)
+
+    return generation
+
+
+def normalize_query_params(query_params):
+    """Return the query params as a canonical string."""
+    items = []
+    for key in sorted(query_params):
+        for value in query_params.getlist(key):
+            parts = sorted(set(value.split(',')))
+            items.append(f'{key}={",".join(parts)}')
+
+    return '&'.join(items)
+
+
+def request_digest(request):
+    """Return a digest of everything which selects a response."""
+    raw = '|'.join([
+        request.get_host(),
+        request.path,
+        request.accepted_renderer.format,
+        normalize_query_params(request.query_params),
+    ])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def list_cache_key(request):
+    """Return the cache key of a list request."""
+    user_id = request.user.pk
+    return LIST_KEY.format(
+        user_id=user_id,
+        generation=get_generation(user_id),
+        digest=request_digest(request),
+    )
+
+
+def get_stats():
+    """Return the hit and miss counters of the list cache."""
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+class CachedListMixin:
+    """Cache list responses per user and invalidate them on writes."""
+    list_cache_timeout = settings.RECIPE_LIST_CACHE_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        """Return the cached list response if there is one."""
+        key = list_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _incr(HITS_KEY)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _incr(MISSES_KEY)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=self.list_cache_timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Invalidate the user's cached lists after a successful write."""
+        if request.method not in SAFE_METHODS and \
+                response.status_code < 400 and \
+                request.user.is_authenticated:
+            bump_generation(request.user.pk)
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """
+    Answer conditional GETs from the user's generation.
+
+    The ETag is known before any query runs, so a matching If-None-Match
+    is answered with a 304 without loading or serializing anything. No
+    Last-Modified is sent: at the one second precision of HTTP dates, a
+    write in the same second as a read would go unnoticed.
+    """
+
+    def get_etag(self, request):
+        """Return the ETag of the request."""
+        generation = get_generation(request.user.pk)
+        raw = f'{request.user.pk}:{generation}:{request_digest(request)}'
+
+        return '"%s"' % hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def conditional(self, handler, request, *args, **kwargs):
+        """Return a 304 response or the response of the handler."""
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Return the list unless the client copy is current."""
+        return self.conditional(super().list, request, *args, **kwargs)
@@ -0,0 +1,28 @@
+"""
+System checks of the recipe APIs.
+"""
+from django.core.checks import (
+    Error,
+    Tags,
+    register,
+)
+
+from recipe.cache import is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Reject a cache which is local to each process in deployments."""
+    if is_shared():
+        return []
+
+    return [Error(
+        'The default cache is local to each process.',
+        hint=(
+            'Set REDIS_URL, or CACHE_BACKEND and CACHE_LOCATION, to a cache '
+            'shared by every process. Otherwise writes only invalidate the '
+            'cached lists, tokens and revocations of the process handling '
+            'them.'
+        ),
+        id='recipe.E001',
+    )]
@@ -0,0 +1,170 @@
+"""
+Fast read-only serialization for the list APIs.
+
+Builds the same representation as the serializers straight from values()
+rows, plus one grouped query per nested relation, skipping the per field
+dispatch of ModelSerializer.to_representation. The output renders to the
+same JSON bytes as the serializers.
+"""
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core.models import Recipe
+
+
+RELATED_FIELDS = ('tags', 'ingredients')
+
+_price_field = Recipe._meta.get_field('price')
+CONVERTERS = {
+    'price': serializers.DecimalField(
+        max_digits=_price_field.max_digits,
+        decimal_places=_price_field.decimal_places,
+    ).to_representation,
+}
+# Rendered as URLs, like serializers.ImageField.
+FILE_FIELDS = ('thumbnail',)
+
+
+def recipe_values(queryset, fields):
+    """Return the queryset as rows holding the columns of the fields."""
+    columns = {'id'}
+    columns.update(name for name in fields if name not in RELATED_FIELDS)
+    if 'rank' in queryset.query.annotations:
+        columns.add('rank')
+
+    return queryset.prefetch_related(None).values(*columns)
+
+
+def related_items(field_name, recipe_ids):
+    """Return the nested items of a relation grouped by recipe ID."""
+    field = Recipe._meta.get_field(field_name)
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    rows = field.remote_field.through.objects.filter(**{
+        f'{source}_id__in': recipe_ids,
+    }).order_by(f'{target}_id').values_list(
+        f'{source}_id',
+        f'{target}_id',
+        f'{target}__name',
+    )
+
+    grouped = defaultdict(list)
+    for recipe_id, item_id, name in rows:
+        grouped[recipe_id].append({'id': item_id, 'name': name})
+
+    return grouped
+
+
+def file_url(name, request=None):
+    """Return the URL of a stored file, absolute if there is a request."""
+    if not name:
+        return None
+    url = default_storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+
+    return url
+
+
+def build_recipes(rows, fields, request=None):
+    """Return the representation of recipe rows."""
+    rows = list(rows)
+    ids = [row['id'] for row in rows]
+    related = {
+        name: related_items(name, ids) if ids else {}
+        for name in RELATED_FIELDS if name in fields
+    }
+
+    data = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            if name in related:
+                item[name] = related[name].get(row['id'], [])
+            elif name in CONVERTERS:
+                item[name] = CONVERTERS[name](row[name])
+            elif name in FILE_FIELDS:
+                item[name] = file_url(row[name], request)
+            else:
+                item[name] = row[name]
+        data.append(item)
+
+    return data
+
+
+def iter_chunks(rows, chunk_size):
+    """Yield lists of at most chunk_size rows."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_recipes(queryset, fields, chunk_size, ndjson=False,
+                   request=None):
+    """
+    Yield the recipes of the queryset as encoded JSON.
+
+    Rows are read through a server-side cursor and the nested relations are
+    loaded per chunk, so memory use does not grow with the queryset. The
+    output is a JSON array, or one object per line if ndjson is set.
+    """
+    renderer = JSONRenderer()
+    rows = recipe_values(queryset, fields).iterator(chunk_size=chunk_size)
+    separator = b'\n' if ndjson else b','
+    first = True
+    if not ndjson:
+        yield b'['
+    for chunk in iter_chunks(rows, chunk_size):
+        body = separator.join(
+            renderer.render(item)
+            for item in build_recipes(chunk, fields, request)
+        )
+        if ndjson:
+            yield body + b'\n'
+        else:
+            yield body if first else b',' + body
+        first = False
+    if not ndjson:
+        yield b']'
+
+
+class FastListMixin:
+    """
+    Render list responses from values() rows when
+    RECIPE_FAST_LIST_SERIALIZATION is enabled.
+    """
+
+    def get_fast_fields(self):
+        """Return the fields to render."""
+        return self.get_serializer_class().Meta.fields
+
+    def get_fast_rows(self, queryset):
+        """Return the queryset as rows."""
+        return queryset.values(*self.get_fast_fields())
+
+    def build_fast_data(self, rows):
+        """Return the representation of the rows."""
+        return list(rows)
+
+    def list(self, request, *args, **kwargs):
+        """List objects, bypassing the serializer if enabled."""
+        if not settings.RECIPE_FAST_LIST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.get_fast_rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.build_fast_data(rows))
+
+        return self.get_paginated_response(self.build_fast_data(page))
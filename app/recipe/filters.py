@@ -0,0 +1,157 @@
+"""
+Filters for the recipe APIs.
+"""
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+)
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    FloatField,
+    IntegerField,
+    OuterRef,
+    Subquery,
+)
+from django.db.models.functions import Cast
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+
+MAX_FILTER_IDS = 100
+MAX_ID = 2 ** 63 - 1
+
+MAX_SEARCH_LENGTH = 200
+SEARCH_CONFIG = 'english'
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_CHOICES = [MATCH_ANY, MATCH_ALL]
+
+OUTPUT_JSON = 'json'
+OUTPUT_NDJSON = 'ndjson'
+OUTPUT_CHOICES = [OUTPUT_JSON, OUTPUT_NDJSON]
+
+
+def parse_id_list(value, param, max_length=MAX_FILTER_IDS):
+    """Convert a comma separated list of IDs to a sorted list of integers."""
+    ids = set()
+    for part in value.split(','):
+        part = part.strip()
+        if not (part.isascii() and part.isdigit()) or int(part) > MAX_ID:
+            raise ValidationError({param: [f'"{part}" is not a valid ID.']})
+        ids.add(int(part))
+
+    if len(ids) > max_length:
+        raise ValidationError({
+            param: [f'Ensure this list has no more than {max_length} IDs.'],
+        })
+
+    return sorted(ids)
+
+
+def parse_fields(value, allowed):
+    """Return the requested fields in the order they are declared."""
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValidationError({
+            'fields': [f'Unknown fields: {", ".join(sorted(unknown))}.'],
+        })
+    if not requested:
+        raise ValidationError({'fields': ['Select at least one field.']})
+
+    return [name for name in allowed if name in requested]
+
+
+def parse_match(value):
+    """Return the match mode requested by the client."""
+    if value is None:
+        return MATCH_ANY
+    if value not in MATCH_CHOICES:
+        raise ValidationError({
+            'match': [f'Must be one of: {", ".join(MATCH_CHOICES)}.'],
+        })
+
+    return value
+
+
+def parse_output(value):
+    """Return the export output format requested by the client."""
+    if value is None:
+        return OUTPUT_JSON
+    if value not in OUTPUT_CHOICES:
+        raise ValidationError({
+            'output': [f'Must be one of: {", ".join(OUTPUT_CHOICES)}.'],
+        })
+
+    return value
+
+
+def filter_recipes_by_related(queryset, field_name, ids, match=MATCH_ANY):
+    """
+    Filter recipes by the IDs of a many to many field.
+
+    Uses correlated subqueries on the through table instead of joins, so
+    the result has no duplicate rows and does not need DISTINCT.
+    """
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    links = through.objects.filter(**{
+        field.m2m_field_name(): OuterRef('pk'),
+        f'{field.m2m_reverse_field_name()}__in': ids,
+    })
+
+    if match == MATCH_ALL:
+        matched = links.order_by().values(field.m2m_field_name()).annotate(
+            matched=Count('pk'),
+        ).values('matched')
+        return queryset.alias(**{
+            f'{field_name}_matched': Subquery(
+                matched,
+                output_field=IntegerField(),
+            ),
+        }).filter(**{f'{field_name}_matched': len(ids)})
+
+    return queryset.filter(Exists(links))
+
+
+def filter_assigned(queryset, field_name):
+    """Filter tags or ingredients to those assigned to a recipe."""
+    field = Recipe._meta.get_field(field_name)
+    links = field.remote_field.through.objects.filter(**{
+        field.m2m_reverse_field_name(): OuterRef('pk'),
+    })
+
+    return queryset.filter(Exists(links))
+
+
+def parse_search(value):
+    """Return the search terms requested by the client."""
+    value = (value or '').strip()
+    if len(value) > MAX_SEARCH_LENGTH:
+        raise ValidationError({
+            'search': [
+                f'Ensure this field has no more than {MAX_SEARCH_LENGTH} '
+                'characters.'
+            ],
+        })
+
+    return value
+
+
+def search_recipes(queryset, terms):
+    """
+    Filter recipes by full text search and annotate them with a rank.
+
+    The match runs against the GIN indexed `search_vector` column. The rank
+    is cast to double precision so it survives the round trip through a
+    pagination cursor unchanged.
+    """
+    query = SearchQuery(terms, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+    )
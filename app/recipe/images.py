@@ -0,0 +1,267 @@
+"""
+Renditions of recipe images, rendered off the request path.
+
+Uploading an image only stores the original and queues an ImageJob. The
+process_image_jobs command claims jobs from the table, renders a cropped
+thumbnail and a medium size image, each as JPEG and WebP, and writes them
+to Recipe.renditions and Recipe.thumbnail. Several workers can run at once,
+as jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED.
+
+With RECIPE_IMAGE_CONTENT_ADDRESSED, originals are stored once per distinct
+content in StoredImage, named by their SHA-256, and counted by the recipes
+using them. Recipes sharing an image share its renditions too.
+"""
+import hashlib
+import io
+import os
+from datetime import timedelta
+
+from PIL import (
+    Image,
+    ImageOps,
+)
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import (
+    IntegrityError,
+    transaction,
+)
+from django.db.models import (
+    F,
+    Q,
+)
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import (
+    ImageJob,
+    Recipe,
+    StoredImage,
+    sharded_path,
+)
+from recipe.cache import bump_generation
+
+
+# Name: (size, crop to the size, format).
+RENDITIONS = {
+    'thumbnail': ((160, 160), True, 'JPEG'),
+    'thumbnail_webp': ((160, 160), True, 'WEBP'),
+    'medium': ((800, 800), False, 'JPEG'),
+    'medium_webp': ((800, 800), False, 'WEBP'),
+}
+THUMBNAIL = 'thumbnail'
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+QUALITY = {'JPEG': 85, 'WEBP': 80}
+
+MAX_ATTEMPTS = 5
+# How long a claimed job is left to a worker before others may retry it.
+LEASE = timedelta(minutes=10)
+
+
+def rendition_path(source, name, image_format):
+    """Return the storage path of a rendition of an image."""
+    stem = os.path.splitext(os.path.basename(source))[0]
+
+    return os.path.join(
+        sharded_path(os.path.join('uploads', 'recipe', 'renditions'), stem),
+        f'{name}.{EXTENSIONS[image_format]}',
+    )
+
+
+def render(image, size, crop, image_format):
+    """Return a rendition of an image as bytes."""
+    if crop:
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    output = io.BytesIO()
+    image.save(output, format=image_format, quality=QUALITY[image_format])
+
+    return image.size, output.getvalue()
+
+
+def create_renditions(source):
+    """Store the renditions of an image and return them by name."""
+    with default_storage.open(source) as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+        renditions = {}
+        for name, (size, crop, image_format) in RENDITIONS.items():
+            (width, height), data = render(image, size, crop, image_format)
+            path = rendition_path(source, name, image_format)
+            default_storage.delete(path)
+            renditions[name] = {
+                'path': default_storage.save(path, ContentFile(data)),
+                'width': width,
+                'height': height,
+            }
+
+    return renditions
+
+
+def delete_renditions(renditions):
+    """Delete the files of renditions."""
+    for rendition in renditions.values():
+        default_storage.delete(rendition['path'])
+
+
+def release_renditions(renditions, stored_image_id=None):
+    """Delete the renditions of a replaced image unless still shared."""
+    if stored_image_id and Recipe.objects.filter(
+        stored_image_id=stored_image_id,
+    ).exists():
+        return
+
+    delete_renditions(renditions)
+
+
+def hash_file(upload):
+    """Return the SHA-256 of an uploaded file."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+
+    return digest.hexdigest()
+
+
+def store_image(upload):
+    """
+    Return the stored image of an upload, with one more reference.
+
+    The file is only written if no image has the same content yet. Must
+    run in a transaction, which keeps the stored image locked until the
+    recipe using it is saved, so that it is neither collected nor moved
+    in the meantime.
+    """
+    digest = hash_file(upload)
+    while True:
+        stored = StoredImage.objects.select_for_update().filter(
+            sha256=digest,
+        ).first()
+        if stored is not None:
+            StoredImage.objects.filter(pk=stored.pk).update(
+                ref_count=F('ref_count') + 1,
+            )
+            return stored
+
+        stored = StoredImage(sha256=digest, size=upload.size, ref_count=1)
+        stored.image.save(upload.name, upload, save=False)
+        try:
+            with transaction.atomic():
+                stored.save()
+            return stored
+        except IntegrityError:
+            # Stored by a concurrent upload of the same content.
+            stored.image.delete(save=False)
+
+
+def release_image(stored_image_id):
+    """Drop a reference to a stored image."""
+    if stored_image_id:
+        StoredImage.objects.filter(
+            pk=stored_image_id,
+            ref_count__gt=0,
+        ).update(ref_count=F('ref_count') - 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_recipe_image(sender, instance, **kwargs):
+    """Drop the reference of a deleted recipe to its stored image."""
+    release_image(instance.stored_image_id)
+
+
+def schedule_renditions(recipe):
+    """Queue the rendering of the current image of a recipe."""
+    ImageJob.objects.filter(recipe=recipe).delete()
+    if not recipe.image:
+        return
+
+    # Another recipe may already have the renditions of a stored image.
+    rendered = recipe.stored_image_id and Recipe.objects.filter(
+        stored_image_id=recipe.stored_image_id,
+        image=recipe.image.name,
+    ).exclude(renditions={}).values('renditions', 'thumbnail').first()
+    if rendered:
+        Recipe.objects.filter(pk=recipe.pk).update(**rendered)
+        recipe.renditions = rendered['renditions']
+        recipe.thumbnail = rendered['thumbnail']
+        return
+
+    ImageJob.objects.create(recipe=recipe, source=recipe.image.name)
+
+
+def claim_jobs(limit):
+    """Lease up to limit available jobs to this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(ImageJob.objects.select_for_update(
+            skip_locked=True,
+        ).filter(
+            status__in=[ImageJob.Status.PENDING, ImageJob.Status.RUNNING],
+            available_at__lte=now,
+        ).order_by('available_at')[:limit])
+        ImageJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=ImageJob.Status.RUNNING,
+            attempts=F('attempts') + 1,
+            available_at=now + LEASE,
+        )
+
+    for job in jobs:
+        job.attempts += 1
+
+    return jobs
+
+
+def process_job(job):
+    """Render the renditions of a job and attach them to its recipes."""
+    recipe = Recipe.objects.filter(
+        pk=job.recipe_id,
+        image=job.source,
+    ).values('stored_image_id', 'renditions').first()
+    # Skipped if the image was replaced, or the renditions were shared by
+    # the job of another recipe with the same stored image.
+    if recipe is not None and not recipe['renditions']:
+        renditions = create_renditions(job.source)
+        # The image may have been replaced while rendering.
+        recipes = Recipe.objects.filter(image=job.source).filter(
+            Q(pk=job.recipe_id) | Q(
+                stored_image_id=recipe['stored_image_id'],
+                stored_image__isnull=False,
+                renditions={},
+            )
+        )
+        user_ids = set(recipes.values_list('user_id', flat=True))
+        updated = recipes.update(
+            renditions=renditions,
+            thumbnail=renditions[THUMBNAIL]['path'],
+            updated_at=timezone.now(),
+        )
+        # Seen by the web processes through the cache the worker shares.
+        for user_id in user_ids:
+            bump_generation(user_id)
+        if not updated:
+            delete_renditions(renditions)
+
+    job.delete()
+
+
+def fail_job(job, error):
+    """Retry a failed job later, or give up after MAX_ATTEMPTS."""
+    job.error = str(error)
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = ImageJob.Status.FAILED
+    else:
+        job.status = ImageJob.Status.PENDING
+        job.available_at = timezone.now() + timedelta(
+            seconds=30 * 2 ** job.attempts,
+        )
+    job.save(update_fields=['error', 'status', 'available_at'])
@@ -0,0 +1,174 @@
+"""
+Pagination for the recipe APIs.
+"""
+import json
+from base64 import (
+    urlsafe_b64decode,
+    urlsafe_b64encode,
+)
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination with an opaque cursor.
+
+    The cursor holds the ordering values of the last item of the page, so
+    the next page is fetched with a WHERE clause on those values instead of
+    an OFFSET and every page costs the same as the first one.
+    The view's `ordering` must end with a unique field (e.g. `-id`).
+    Pages may hold model instances or values() rows.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering = ('-id',)
+
+    def get_ordering(self, view):
+        """Return the ordering used to build the keyset."""
+        if hasattr(view, 'get_ordering'):
+            return view.get_ordering()
+
+        return getattr(view, 'ordering', None) or self.ordering
+
+    def get_page_size(self, request):
+        """Return the page size requested by the client."""
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is not None:
+            try:
+                page_size = int(page_size)
+            except ValueError:
+                page_size = 0
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+
+        return self.page_size
+
+    def encode_cursor(self, values):
+        """Return an opaque cursor for the given ordering values."""
+        data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+        return urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        """Return the ordering values held by the request cursor."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            values = json.loads(urlsafe_b64decode(encoded + padding))
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or \
+                len(values) != len(self.ordering_fields):
+            raise NotFound(self.invalid_cursor_message)
+
+        return values
+
+    def get_keyset_filter(self, values):
+        """Return a filter selecting the rows after the given values."""
+        keyset = Q()
+        for index, (field, descending) in enumerate(self.ordering_fields):
+            lookup = 'lt' if descending else 'gt'
+            condition = Q(**{f'{field}__{lookup}': values[index]})
+            for prev_index in range(index):
+                prev_field = self.ordering_fields[prev_index][0]
+                condition &= Q(**{prev_field: values[prev_index]})
+            keyset |= condition
+
+        return keyset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a single page of results."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(view)
+        self.ordering_fields = [
+            (field.lstrip('-'), field.startswith('-')) for field in ordering
+        ]
+
+        values = self.decode_cursor(request)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(values))
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        return self.page
+
+    def get_next_link(self):
+        """Return the URL of the next page, if any."""
+        if not self.has_next:
+            return None
+
+        last = self.page[-1]
+        if isinstance(last, dict):
+            values = [last[field] for field, _ in self.ordering_fields]
+        else:
+            values = [
+                getattr(last, field) for field, _ in self.ordering_fields
+            ]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(values),
+        )
+
+    def get_paginated_response(self, data):
+        """Return the page wrapped with a link to the next page."""
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        """Return the schema of a paginated response."""
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        """Return the query parameters accepted by the pagination."""
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
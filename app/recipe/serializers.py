@@ -1,6 +1,14 @@
 """
 Serializers for recipe APIs
 """
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import (
+    Min,
+    Prefetch,
+    prefetch_related_objects,
+)
+
 from rest_framework import serializers
 
 from core.models import (
@@ -10,8 +18,26 @@ from core.models import (
 )
 
 
+class UniqueNameMixin:
+    """Reject renaming an object to a name the user already has."""
+
+    def validate_name(self, value):
+        """Check no other object of the user has the name."""
+        instance = self.instance
+        if instance is not None and type(instance).objects.filter(
+            user=instance.user,
+            name=value,
+        ).exclude(id=instance.id).exists():
+            raise serializers.ValidationError(
+                f'A {instance._meta.verbose_name} with this name '
+                'already exists.'
+            )
+
+        return value
+
+
 # 107 Implement ingredient listing API
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for ingredients."""
 
     class Meta:
@@ -22,7 +48,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 # 92 Implement tag listing API
 # 99 Nestのために先頭に移動
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for tags."""
 
     class Meta:
@@ -31,7 +57,215 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+BULK_MAX_ITEMS = 1000
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Serializer for a list of object IDs."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+
+class BulkRenameItemSerializer(serializers.Serializer):
+    """Serializer for the new name of an object."""
+    id = serializers.IntegerField(min_value=1)
+    name = serializers.CharField(max_length=255)
+
+
+class BulkRenameSerializer(serializers.Serializer):
+    """Serializer for renaming many objects."""
+    items = BulkRenameItemSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+    def validate_items(self, value):
+        """Check each object and each name appears once."""
+        for key in ['id', 'name']:
+            if len({item[key] for item in value}) != len(value):
+                raise serializers.ValidationError(
+                    f'Each {key} may only appear once.'
+                )
+
+        return value
+
+
+class DynamicFieldsMixin:
+    """Serializer mixin which only renders the fields passed as `fields`."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def resolve_by_name(model, user, names):
+    """
+    Return the user's objects by name, creating the missing ones.
+
+    Missing rows are inserted with ON CONFLICT DO NOTHING and selected again,
+    so concurrent requests creating the same name share one row.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+
+    queryset = model.objects.filter(user=user)
+    objects = {
+        obj.name: obj for obj in queryset.filter(name__in=names)
+    }
+    missing = [name for name in names if name not in objects]
+    if missing:
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        objects.update(
+            (obj.name, obj) for obj in queryset.filter(name__in=missing)
+        )
+
+    return objects
+
+
+def add_related(user, field_name, recipes, names):
+    """
+    Link each recipe to the user's tags or ingredients with the given names.
+
+    `names` holds one list of names per recipe. All the names are resolved
+    at once and the through rows are written in a single insert.
+    """
+    field = Recipe._meta.get_field(field_name)
+    objects = resolve_by_name(
+        field.related_model,
+        user,
+        [name for recipe_names in names for name in recipe_names],
+    )
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    rows = [
+        through(**{
+            f'{source}_id': recipe.id,
+            f'{target}_id': objects[name].id,
+        })
+        for recipe, recipe_names in zip(recipes, names)
+        for name in dict.fromkeys(recipe_names)
+    ]
+    if rows:
+        through.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def set_related(user, field_name, recipe, names):
+    """
+    Make the recipe's tags or ingredients exactly the ones with the names.
+
+    Only the through rows of the added and removed items are written, and
+    names the recipe already has are not looked up again. Return whether
+    anything changed.
+    """
+    field = Recipe._meta.get_field(field_name)
+    current = {obj.name: obj.id for obj in getattr(recipe, field_name).all()}
+    names = list(dict.fromkeys(names))
+    objects = resolve_by_name(field.related_model, user, [
+        name for name in names if name not in current
+    ])
+    wanted = {
+        current[name] if name in current else objects[name].id
+        for name in names
+    }
+    removed = set(current.values()) - wanted
+    added = wanted - set(current.values())
+
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    if removed:
+        through.objects.filter(**{
+            f'{source}_id': recipe.id,
+            f'{target}_id__in': removed,
+        }).delete()
+    if added:
+        through.objects.bulk_create([
+            through(**{f'{source}_id': recipe.id, f'{target}_id': pk})
+            for pk in added
+        ], ignore_conflicts=True)
+
+    return bool(removed or added)
+
+
+def merge_related(field_name, target, sources):
+    """
+    Move the recipes of the source tags or ingredients onto the target.
+
+    The through rows are repointed in one UPDATE, keeping a single row per
+    recipe and skipping recipes which already have the target. The rows
+    left behind are removed with the sources. Return the number of
+    sources merged and of recipes moved.
+    """
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = f'{field.m2m_field_name()}_id'
+    target_field = f'{field.m2m_reverse_field_name()}_id'
+
+    movable = through.objects.filter(**{
+        f'{target_field}__in': sources.values('id'),
+    }).exclude(**{
+        f'{source}__in': through.objects.filter(**{
+            target_field: target.id,
+        }).values(source),
+    }).values(source).annotate(first=Min('id')).values('first')
+
+    with transaction.atomic():
+        moved = through.objects.filter(id__in=movable).update(**{
+            target_field: target.id,
+        })
+        _, deleted = sources.delete()
+
+    return deleted.get(sources.model._meta.label, 0), moved
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Create many recipes with a constant number of queries."""
+    related_models = {
+        'tags': Tag,
+        'ingredients': Ingredient,
+    }
+
+    def create(self, validated_data):
+        """Create the recipes, their tags and ingredients in bulk."""
+        user = self.context['request'].user
+        related = [
+            {
+                name: [item['name'] for item in data.pop(name, [])]
+                for name in self.related_models
+            }
+            for data in validated_data
+        ]
+
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create([
+                Recipe(user=user, **data) for data in validated_data
+            ])
+            for name in self.related_models:
+                add_related(user, name, recipes, [
+                    names[name] for names in related
+                ])
+
+        prefetch_related_objects(recipes, *[
+            Prefetch(name, queryset=model.objects.order_by('id'))
+            for name, model in self.related_models.items()
+        ])
+        return recipes
+
+
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipes."""
 
     # 99 Implement create tag feature
@@ -46,31 +280,27 @@ class RecipeSerializer(serializers.ModelSerializer):
             'id', 'title', 'time_minutes', 'price', 'link',
             'tags', # 99で追加
             'ingredients', # 113で追加
+            'thumbnail',
         ]
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
 
     # 101 Implement update recipe tags feature
     def _get_or_create_tags(self, tags, recipe):
         """Handle getting or creating tags as needed."""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        add_related(auth_user, 'tags', [recipe], [
+            [tag['name'] for tag in tags],
+        ])
 
     # 113 Implement create ingredients feature
     # internal onlyのため_をprefixにつける
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredients as needed."""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        add_related(auth_user, 'ingredients', [recipe], [
+            [ingredient['name'] for ingredient in ingredients],
+        ])
 
     # 99 Implement create tag feature
     def create(self, validated_data):
@@ -101,27 +331,65 @@ class RecipeSerializer(serializers.ModelSerializer):
         """Update recipe."""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None) # 115で追加
+        auth_user = self.context['request'].user
+
+        # Only write the through rows and columns which actually change.
+        related_changed = False
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance) # これで配列ごと抜き出すのか。。Serializerのインナーメソッドらしい。あ、違った。これから書くんだ。
+            related_changed |= set_related(auth_user, 'tags', instance, [
+                tag['name'] for tag in tags
+            ])
 
         # 115で追加
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            related_changed |= set_related(
+                auth_user,
+                'ingredients',
+                instance,
+                [ingredient['name'] for ingredient in ingredients],
+            )
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value) # こんな書き方あるんだ。。
+        update_fields = [
+            attr for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+        for attr in update_fields:
+            setattr(instance, attr, validated_data[attr]) # こんな書き方あるんだ。。
 
-        instance.save() # これなんぞ？
+        if update_fields or related_changed:
+            instance.save(update_fields=update_fields + ['updated_at'])
         return instance
 
 
+class RenditionSerializer(serializers.Serializer):
+    """Serializer for a rendition of a recipe image."""
+    url = serializers.SerializerMethodField()
+    width = serializers.IntegerField()
+    height = serializers.IntegerField()
+
+    def get_url(self, rendition) -> str:
+        """Return the URL of the rendition, like ImageField does."""
+        url = default_storage.url(rendition['path'])
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+
+        return url
+
+
 class RecipeDetailSerializer(RecipeSerializer): # RecipeSerializerを継承する！！！
     """Serializer for recipe detail view."""
+    # Renditions by name, empty until they are rendered.
+    renditions = serializers.DictField(
+        child=RenditionSerializer(),
+        read_only=True,
+    )
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image'] # 詳細ビューではdescriptionを追加する！！！ imageは#127で追加。
+        fields = RecipeSerializer.Meta.fields + ['description', 'image', 'renditions'] # 詳細ビューではdescriptionを追加する！！！ imageは#127で追加。
+        # Images only arrive through the upload-image action, which checks,
+        # stores and renders them.
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + ['image']
 
 
 # 126 Implement image API
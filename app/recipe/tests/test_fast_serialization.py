@@ -0,0 +1,113 @@
+"""
+Tests for the fast list serialization path.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class FastSerializationTests(TestCase):
+    """Test the fast path renders the same bytes as the serializers."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Vegan', 'Dinner', 'Spicy']
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Rice', 'Chili', 'Tofu "silken"']
+        ]
+        for i, price in enumerate(['5.50', '10.00', '0.05', '999.99']):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Spicy tofu curry {i}',
+                description='Sample description',
+                time_minutes=10 + i,
+                price=Decimal(price),
+                link='https://example.com/recipe.pdf',
+            )
+            recipe.tags.add(*reversed(tags[:i + 1]))
+            recipe.ingredients.add(*ingredients[i % 3:])
+
+    def get_both(self, url, params=None):
+        """Return the responses of the serializer and the fast path."""
+        responses = []
+        for enabled in [False, True]:
+            cache.clear()
+            with override_settings(RECIPE_FAST_LIST_SERIALIZATION=enabled):
+                responses.append(self.client.get(url, params))
+
+        return responses
+
+    def assertSameContent(self, url, params=None):
+        """Assert both paths return the same status and bytes."""
+        slow, fast = self.get_both(url, params)
+
+        self.assertEqual(slow.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.status_code, slow.status_code)
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_recipe_list_identical(self):
+        """Test the recipe list is byte identical."""
+        self.assertSameContent(RECIPES_URL)
+
+    def test_recipe_list_pages_identical(self):
+        """Test paginated recipe lists and next links are identical."""
+        res = self.assertSameContent(RECIPES_URL, {'page_size': 3})
+
+        self.assertIsNotNone(res.data['next'])
+        self.assertSameContent(res.data['next'])
+
+    def test_recipe_search_identical(self):
+        """Test ranked search results are identical."""
+        self.assertSameContent(RECIPES_URL, {'search': 'tofu', 'page_size': 2})
+
+    def test_recipe_sparse_fields_identical(self):
+        """Test sparse fieldsets are identical."""
+        self.assertSameContent(RECIPES_URL, {'fields': 'price,ingredients'})
+
+    def test_tag_list_identical(self):
+        """Test the tag list is byte identical."""
+        self.assertSameContent(TAGS_URL)
+        self.assertSameContent(TAGS_URL, {'assigned_only': 1})
+
+    def test_ingredient_list_identical(self):
+        """Test the ingredient list is byte identical."""
+        self.assertSameContent(INGREDIENTS_URL, {'page_size': 2})
+
+    @override_settings(RECIPE_FAST_LIST_SERIALIZATION=True)
+    def test_fast_list_query_count(self):
+        """Test the fast path loads relations in bulk."""
+        cache.clear()
+
+        with self.assertNumQueries(3):
+            self.client.get(RECIPES_URL)
@@ -21,6 +21,7 @@ from recipe.serializers import IngredientSerializer
 
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+INGREDIENTS_BULK_URL = reverse('recipe:ingredient-bulk')
 
 # 108 Write tests for updating ingredients
 def detail_url(ingredient_id):
@@ -67,7 +68,7 @@ class PrivateIngredientsApiTest(TestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test list of ingredients is limited to authenticated user."""
@@ -78,9 +79,9 @@ class PrivateIngredientsApiTest(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
-        self.assertEqual(res.data[0]['id'], ingredient.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
+        self.assertEqual(res.data['results'][0]['id'], ingredient.id)
 
     # 108 Write tests for updating ingredients
     def test_upgrade_ingredient(self):
@@ -124,8 +125,8 @@ class PrivateIngredientsApiTest(TestCase):
 
         s1 = IngredientSerializer(in1)
         s2 = IngredientSerializer(in2)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     # 132 Add tests for filtering tags and ingredients
     def test_filtered_ingredients_unique(self):
@@ -149,4 +150,185 @@ class PrivateIngredientsApiTest(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_bulk_delete_ingredients(self):
+        """Test deleting many ingredients of the user at once."""
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'Spice {i}')
+            for i in range(3)
+        ]
+        other = Ingredient.objects.create(
+            user=create_user(email='other@example.com'),
+            name='Salt',
+        )
+        recipe = Recipe.objects.create(
+            title='Curry',
+            time_minutes=30,
+            price=Decimal('5.00'),
+            user=self.user,
+        )
+        recipe.ingredients.add(ingredients[0], ingredients[2])
+        ids = [ingredients[0].id, ingredients[1].id, other.id]
+
+        with self.assertNumQueries(3):
+            res = self.client.delete(
+                INGREDIENTS_BULK_URL,
+                {'ids': ids},
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 2})
+        self.assertEqual(
+            list(Ingredient.objects.filter(user=self.user)),
+            [ingredients[2]],
+        )
+        self.assertTrue(Ingredient.objects.filter(id=other.id).exists())
+        self.assertEqual(list(recipe.ingredients.all()), [ingredients[2]])
+
+    def test_bulk_delete_invalid_ids(self):
+        """Test bulk delete validates the list of IDs."""
+        for payload in [{}, {'ids': []}, {'ids': ['abc']}]:
+            res = self.client.delete(
+                INGREDIENTS_BULK_URL,
+                payload,
+                format='json',
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_rename_ingredients(self):
+        """Test renaming many ingredients of the user in one statement."""
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'Spice {i}')
+            for i in range(3)
+        ]
+        other = Ingredient.objects.create(
+            user=create_user(email='other@example.com'),
+            name='Salt',
+        )
+        payload = {'items': [
+            {'id': ingredients[0].id, 'name': 'Cumin'},
+            {'id': ingredients[2].id, 'name': 'Paprika'},
+            {'id': other.id, 'name': 'Pepper'},
+        ]}
+
+        # savepoint, placeholder names, new names, release
+        with self.assertNumQueries(4):
+            res = self.client.patch(
+                INGREDIENTS_BULK_URL,
+                payload,
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 2})
+        names = [
+            Ingredient.objects.get(id=ingredient.id).name
+            for ingredient in ingredients + [other]
+        ]
+        self.assertEqual(names, ['Cumin', 'Spice 1', 'Paprika', 'Salt'])
+
+    def test_bulk_rename_conflict(self):
+        """Test renaming to a name already in use changes nothing."""
+        first = Ingredient.objects.create(user=self.user, name='Salt')
+        second = Ingredient.objects.create(user=self.user, name='Pepper')
+        Ingredient.objects.create(user=self.user, name='Sea salt')
+        payload = {'items': [
+            {'id': first.id, 'name': 'Sea salt'},
+            {'id': second.id, 'name': 'Black pepper'},
+        ]}
+
+        res = self.client.patch(INGREDIENTS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        names = Ingredient.objects.filter(
+            id__in=[first.id, second.id],
+        ).order_by('id').values_list('name', flat=True)
+        self.assertEqual(list(names), ['Salt', 'Pepper'])
+
+    def test_bulk_rename_swap(self):
+        """Test names can be swapped and chained in one request."""
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Salt', 'Pepper', 'Sugar']
+        ]
+        payload = {'items': [
+            {'id': ingredients[0].id, 'name': 'Pepper'},
+            {'id': ingredients[1].id, 'name': 'Salt'},
+            {'id': ingredients[2].id, 'name': 'Brown sugar'},
+        ]}
+
+        res = self.client.patch(INGREDIENTS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 3})
+        names = Ingredient.objects.order_by('id').values_list(
+            'name', flat=True)
+        self.assertEqual(list(names), ['Pepper', 'Salt', 'Brown sugar'])
+
+    def test_bulk_rename_duplicate_names(self):
+        """Test the same name twice in one request is rejected."""
+        first = Ingredient.objects.create(user=self.user, name='Salt')
+        second = Ingredient.objects.create(user=self.user, name='Pepper')
+        payload = {'items': [
+            {'id': first.id, 'name': 'Spice'},
+            {'id': second.id, 'name': 'Spice'},
+        ]}
+
+        res = self.client.patch(INGREDIENTS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('items', res.data)
+
+    def test_merge_ingredients(self):
+        """Test merging ingredients moves their recipes onto the target."""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        lower = Ingredient.objects.create(user=self.user, name='salt')
+        sea = Ingredient.objects.create(user=self.user, name='Sea salt')
+        other = Ingredient.objects.create(
+            user=create_user(email='other@example.com'),
+            name='salt',
+        )
+        recipes = [
+            Recipe.objects.create(
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=Decimal('5.00'),
+                user=self.user,
+            )
+            for i in range(4)
+        ]
+        recipes[0].ingredients.add(salt, lower)
+        recipes[1].ingredients.add(lower, sea)
+        recipes[2].ingredients.add(sea)
+        url = reverse('recipe:ingredient-merge', args=[salt.id])
+
+        res = self.client.post(url, {
+            'ids': [lower.id, sea.id, other.id, salt.id],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'merged': 2, 'recipes': 2})
+        self.assertEqual(
+            list(Ingredient.objects.filter(user=self.user)),
+            [salt],
+        )
+        self.assertTrue(Ingredient.objects.filter(id=other.id).exists())
+        for recipe, expected in zip(recipes, [[salt], [salt], [salt], []]):
+            self.assertEqual(list(recipe.ingredients.all()), expected)
+
+    def test_merge_other_users_target(self):
+        """Test merging into another user's ingredient returns 404."""
+        other = Ingredient.objects.create(
+            user=create_user(email='other@example.com'),
+            name='Salt',
+        )
+        mine = Ingredient.objects.create(user=self.user, name='salt')
+        url = reverse('recipe:ingredient-merge', args=[other.id])
+
+        res = self.client.post(url, {'ids': [mine.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Ingredient.objects.filter(id=mine.id).exists())
@@ -0,0 +1,185 @@
+"""
+Tests for the recipe list response cache.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+
+from recipe.cache import get_stats
+from recipe.checks import check_shared_cache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+CACHE_STATS_URL = reverse('recipe:cache-stats')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def tag_detail_url(tag_id):
+    """Create and return a tag detail URL."""
+    return reverse('recipe:tag-detail', args=[tag_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ListCacheTests(TestCase):
+    """Test caching of list responses."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_is_cached(self):
+        """Test a repeated list request is served from the cache."""
+        create_recipe(user=self.user)
+
+        res1 = self.client.get(RECIPES_URL)
+        with self.assertNumQueries(0):
+            res2 = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res1['X-Cache'], 'MISS')
+        self.assertEqual(res2['X-Cache'], 'HIT')
+        self.assertEqual(res1.content, res2.content)
+        self.assertEqual(get_stats()['hits'], 1)
+        self.assertEqual(get_stats()['misses'], 1)
+
+    def test_query_params_normalized(self):
+        """Test the order of filter IDs does not change the cache key."""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+
+        self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag2.id},{tag1.id}'})
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_create_invalidates_cache(self):
+        """Test creating a recipe invalidates the cached list."""
+        self.client.get(RECIPES_URL)
+        payload = {
+            'title': 'Sample recipe',
+            'time_minutes': 10,
+            'price': Decimal('5.00'),
+        }
+        self.client.post(RECIPES_URL, payload)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_delete_invalidates_cache(self):
+        """Test deleting a recipe invalidates the cached list."""
+        recipe = create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        self.client.delete(detail_url(recipe.id))
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_tag_update_invalidates_recipe_list(self):
+        """Test renaming a tag invalidates the cached recipe list."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        self.client.get(RECIPES_URL)
+
+        self.client.patch(tag_detail_url(tag.id), {'name': 'Vegetarian'})
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        tags = res.data['results'][0]['tags']
+        self.assertEqual(tags[0]['name'], 'Vegetarian')
+
+    def test_failed_write_keeps_cache(self):
+        """Test a rejected write does not invalidate the cache."""
+        self.client.get(TAGS_URL)
+        self.client.patch(tag_detail_url(0), {'name': 'Missing'})
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_cache_limited_to_user(self):
+        """Test cached lists are not shared between users."""
+        create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_cache_stats_requires_staff(self):
+        """Test the cache stats are only available to staff users."""
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_ratio', res.data)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Test the deployment check of the cache backend."""
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_local_memory_cache_rejected(self):
+        """Test a per process cache fails the deployment check."""
+        errors = check_shared_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['recipe.E001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://redis:6379/0',
+    }})
+    def test_shared_cache_accepted(self):
+        """Test a cache shared by every process passes the check."""
+        self.assertEqual(check_shared_cache(None), [])
@@ -97,7 +97,7 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_list_limited_to_user(self):
         """Test list of recipes is limited to authenticated user."""
@@ -110,7 +110,7 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     # 82
     def test_get_recipe_detail(self):
@@ -421,9 +421,9 @@ class PrivateRecipeApiTests(TestCase):
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     # 130 Add tests for filtering recipes
     def test_filter_by_ingredients(self):
@@ -442,9 +442,155 @@ class PrivateRecipeApiTests(TestCase):
         s1 = RecipeSerializer(r1)
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_by_tags_no_duplicates(self):
+        """Test a recipe matching several tags is returned once."""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag1, tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_match_all(self):
+        """Test match=all returns recipes having every tag."""
+        r1 = create_recipe(user=self.user, title='Vegan Curry')
+        r2 = create_recipe(user=self.user, title='Vegan Salad')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_match_all_tags_and_ingredients(self):
+        """Test match=all applies to tags and ingredients together."""
+        r1 = create_recipe(user=self.user, title='Chicken Curry')
+        r2 = create_recipe(user=self.user, title='Chicken Salad')
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        in1 = Ingredient.objects.create(user=self.user, name='Chicken')
+        in2 = Ingredient.objects.create(user=self.user, name='Curry')
+        r1.tags.add(tag)
+        r1.ingredients.add(in1, in2)
+        r2.tags.add(tag)
+        r2.ingredients.add(in1)
+
+        params = {
+            'tags': f'{tag.id}',
+            'ingredients': f'{in1.id},{in2.id}',
+            'match': 'all',
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_invalid_ids(self):
+        """Test invalid filter IDs return 400."""
+        for value in ['abc', '1,,2', '-1', '99999999999999999999']:
+            res = self.client.get(RECIPES_URL, {'tags': value})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('tags', res.data)
+
+    def test_filter_too_many_ids(self):
+        """Test filtering by too many IDs returns 400."""
+        value = ','.join(str(i) for i in range(1, 1000))
+        res = self.client.get(RECIPES_URL, {'ingredients': value})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_invalid_match(self):
+        """Test an unknown match mode returns 400."""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes(self):
+        """Test full text search on title and description."""
+        r1 = create_recipe(user=self.user, title='Spicy Chicken Curry')
+        r2 = create_recipe(
+            user=self.user,
+            title='Rice bowl',
+            description='Served with leftover chicken.',
+        )
+        create_recipe(user=self.user, title='Tomato Soup')
+
+        res = self.client.get(RECIPES_URL, {'search': 'chicken'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [r1.id, r2.id])
+
+    def test_search_after_update(self):
+        """Test search reflects updated titles."""
+        recipe = create_recipe(user=self.user, title='Tomato Soup')
+
+        self.client.patch(detail_url(recipe.id), {'title': 'Pumpkin Soup'})
+        res = self.client.get(RECIPES_URL, {'search': 'pumpkin'})
+
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [recipe.id])
+
+    def test_search_with_filters_and_pagination(self):
+        """Test search is composable with filters and pagination."""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        recipes = []
+        for i in range(3):
+            recipe = create_recipe(user=self.user, title=f'Chicken dish {i}')
+            recipe.tags.add(tag)
+            recipes.append(recipe)
+        create_recipe(user=self.user, title='Chicken without tag')
+
+        params = {'search': 'chicken', 'tags': tag.id, 'page_size': 2}
+        res = self.client.get(RECIPES_URL, params)
+        ids = [item['id'] for item in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [item['id'] for item in res.data['results']]
+
+        self.assertEqual(sorted(ids), [recipe.id for recipe in recipes])
+        self.assertIsNone(res.data['next'])
+
+    def test_search_too_long(self):
+        """Test an overlong search returns 400."""
+        res = self.client.get(RECIPES_URL, {'search': 'a' * 1000})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_paginated_with_cursor(self):
+        """Test recipes are paginated with a cursor in id order."""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [recipes[4].id, recipes[3].id])
+
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [item['id'] for item in res.data['results']]
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_list_invalid_cursor(self):
+        """Test an invalid cursor returns 404."""
+        res = self.client.get(RECIPES_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
 
 # 125 Recipe image API
@@ -489,3 +635,32 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_image_not_writable_through_detail(self):
+        """Test images can only be set through the upload endpoint."""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+        self.recipe.refresh_from_db()
+        image = self.recipe.image.name
+
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (20, 20), 'red').save(image_file, format='JPEG')
+            image_file.seek(0)
+            res = self.client.patch(
+                detail_url(self.recipe.id),
+                {'title': 'New title', 'image': image_file},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.title, 'New title')
+        self.assertEqual(recipe.image.name, image)
+        self.assertEqual(recipe.image_size, self.recipe.image_size)
+        self.assertEqual(recipe.stored_image_id, self.recipe.stored_image_id)
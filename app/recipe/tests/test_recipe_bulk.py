@@ -0,0 +1,141 @@
+"""
+Tests for the bulk recipe creation API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def recipe_payload(i, **params):
+    """Return the payload of a sample recipe."""
+    payload = {
+        'title': f'Recipe {i}',
+        'time_minutes': 10 + i,
+        'price': '5.25',
+        'tags': [{'name': 'Dinner'}, {'name': f'Tag {i}'}],
+        'ingredients': [{'name': 'Salt'}],
+    }
+    payload.update(params)
+    return payload
+
+
+class BulkCreateTests(TestCase):
+    """Test bulk recipe creation."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        """Test auth is required for bulk creation."""
+        res = APIClient().post(BULK_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bulk_create(self):
+        """Test recipes, tags and ingredients are created in bulk."""
+        payload = [recipe_payload(i) for i in range(3)]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        for item, data in zip(payload, res.data):
+            recipe = Recipe.objects.get(id=data['id'], user=self.user)
+            self.assertEqual(recipe.title, item['title'])
+            self.assertEqual(recipe.price, Decimal('5.25'))
+            self.assertEqual(
+                sorted(tag.name for tag in recipe.tags.all()),
+                sorted(tag['name'] for tag in item['tags']),
+            )
+            self.assertEqual(
+                [tag['name'] for tag in data['tags']],
+                [tag.name for tag in recipe.tags.order_by('id')],
+            )
+            self.assertEqual(recipe.ingredients.get().name, 'Salt')
+        self.assertEqual(Tag.objects.filter(name='Dinner').count(), 1)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_reuses_existing(self):
+        """Test existing tags and ingredients of the user are reused."""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        Ingredient.objects.create(user=other_user, name='Salt')
+
+        res = self.client.post(BULK_URL, [
+            recipe_payload(0, tags=[{'name': 'Dinner'}, {'name': 'Dinner'}]),
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(list(recipe.tags.all()), [tag])
+        self.assertEqual(recipe.ingredients.get().user, self.user)
+        self.assertEqual(Ingredient.objects.filter(name='Salt').count(), 2)
+
+    def test_bulk_create_constant_queries(self):
+        """Test the number of queries does not depend on the batch size."""
+        with self.assertNumQueries(13):
+            self.client.post(BULK_URL, [
+                recipe_payload(i, ingredients=[{'name': f'Spice {i}'}])
+                for i in range(2)
+            ], format='json')
+        with self.assertNumQueries(13):
+            res = self.client.post(BULK_URL, [
+                recipe_payload(i, ingredients=[{'name': f'Herb {i}'}])
+                for i in range(50)
+            ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.count(), 52)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """Test invalid items are reported by index and nothing is saved."""
+        payload = [
+            recipe_payload(0),
+            recipe_payload(1, time_minutes='slow'),
+            recipe_payload(2, title=''),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data), 3)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time_minutes', res.data[1])
+        self.assertIn('title', res.data[2])
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_create_limits(self):
+        """Test empty and oversized batches are rejected."""
+        empty = self.client.post(BULK_URL, [], format='json')
+        too_many = self.client.post(BULK_URL, [
+            recipe_payload(i) for i in range(501)
+        ], format='json')
+        not_list = self.client.post(BULK_URL, recipe_payload(0), format='json')
+
+        self.assertEqual(empty.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(too_many.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(not_list.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
@@ -0,0 +1,254 @@
+"""
+Tests for content addressed storage of recipe images.
+"""
+import os
+import tempfile
+from decimal import Decimal
+from io import (
+    BytesIO,
+    StringIO,
+)
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    ImageJob,
+    Recipe,
+    StoredImage,
+)
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_image(color='red'):
+    """Create and return the bytes of a JPEG image."""
+    image_file = BytesIO()
+    Image.new('RGB', (400, 300), color).save(image_file, format='JPEG')
+
+    return image_file.getvalue()
+
+
+@override_settings(RECIPE_IMAGE_CONTENT_ADDRESSED=True)
+class ContentAddressedImageTests(TestCase):
+    """Test identical images are stored once."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        cache.clear()
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipes = [self.create_recipe() for _ in range(2)]
+
+    def create_recipe(self, user=None):
+        """Create and return a recipe."""
+        return Recipe.objects.create(
+            user=user or self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+
+    def upload(self, recipe, data):
+        """Upload image bytes to a recipe."""
+        image_file = BytesIO(data)
+        image_file.name = 'photo.JPG'
+        res = self.client.post(
+            image_upload_url(recipe.id),
+            {'image': image_file},
+            format='multipart',
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+
+    def process_jobs(self):
+        """Run the image jobs."""
+        out = StringIO()
+        call_command('process_image_jobs', once=True, stdout=out, stderr=out)
+
+    def stored_files(self):
+        """Return the names of the stored originals."""
+        directory = os.path.join(settings.MEDIA_ROOT, 'uploads/recipe/sha256')
+        return sorted(
+            name
+            for _, _, names in os.walk(directory)
+            for name in names
+        )
+
+    def test_identical_uploads_stored_once(self):
+        """Test uploading the same image twice stores one file."""
+        data = create_image()
+        for recipe in self.recipes:
+            self.upload(recipe, data)
+
+        stored = StoredImage.objects.get()
+        self.assertEqual(stored.ref_count, 2)
+        self.assertEqual(stored.size, len(data))
+        self.assertEqual(
+            stored.image.name,
+            f'uploads/recipe/sha256/{stored.sha256[:2]}/'
+            f'{stored.sha256[2:4]}/{stored.sha256}.jpg',
+        )
+        self.assertEqual(self.stored_files(), [f'{stored.sha256}.jpg'])
+        for recipe in self.recipes:
+            self.assertEqual(recipe.image.name, stored.image.name)
+            self.assertEqual(recipe.stored_image, stored)
+            self.assertEqual(recipe.image_size, len(data))
+
+    def test_different_uploads_stored_apart(self):
+        """Test different images get their own stored image."""
+        self.upload(self.recipes[0], create_image('red'))
+        self.upload(self.recipes[1], create_image('blue'))
+
+        self.assertEqual(StoredImage.objects.count(), 2)
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_replace_releases_previous_image(self):
+        """Test replacing an image drops the reference to the old one."""
+        self.upload(self.recipes[0], create_image('red'))
+        previous = self.recipes[0].stored_image
+        self.upload(self.recipes[0], create_image('blue'))
+
+        previous.refresh_from_db()
+        self.assertEqual(previous.ref_count, 0)
+        self.assertEqual(self.recipes[0].stored_image.ref_count, 1)
+
+    def test_reupload_keeps_reference_count(self):
+        """Test uploading the same image again does not count it twice."""
+        data = create_image()
+        self.upload(self.recipes[0], data)
+        self.upload(self.recipes[0], data)
+
+        self.assertEqual(StoredImage.objects.get().ref_count, 1)
+
+    def test_delete_recipe_releases_image(self):
+        """Test deleting a recipe drops its reference."""
+        data = create_image()
+        for recipe in self.recipes:
+            self.upload(recipe, data)
+
+        res = self.client.delete(detail_url(self.recipes[0].id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(StoredImage.objects.get().ref_count, 1)
+
+    def test_delete_user_releases_images(self):
+        """Test deleting a user drops the references of its recipes."""
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        data = create_image()
+        for recipe in self.recipes:
+            self.upload(recipe, data)
+        Recipe.objects.filter(pk=self.recipes[1].pk).update(user=other_user)
+
+        other_user.delete()
+
+        self.assertEqual(StoredImage.objects.get().ref_count, 1)
+
+    def test_renditions_shared(self):
+        """Test recipes with the same image share its renditions."""
+        data = create_image()
+        self.upload(self.recipes[0], data)
+        self.process_jobs()
+        self.recipes[0].refresh_from_db()
+
+        self.upload(self.recipes[1], data)
+
+        self.assertFalse(ImageJob.objects.exists())
+        self.assertEqual(
+            self.recipes[1].renditions,
+            self.recipes[0].renditions,
+        )
+        self.assertEqual(self.recipes[1].thumbnail, self.recipes[0].thumbnail)
+
+    def test_pending_renditions_shared(self):
+        """Test one job renders the renditions of recipes sharing an image."""
+        data = create_image()
+        for recipe in self.recipes:
+            self.upload(recipe, data)
+        self.assertEqual(ImageJob.objects.count(), 2)
+
+        self.process_jobs()
+
+        for recipe in self.recipes:
+            recipe.refresh_from_db()
+        self.assertTrue(self.recipes[0].renditions)
+        self.assertEqual(
+            self.recipes[1].renditions,
+            self.recipes[0].renditions,
+        )
+        self.assertFalse(ImageJob.objects.exists())
+
+    def test_shared_renditions_kept_on_replace(self):
+        """Test replacing a shared image keeps the renditions of others."""
+        data = create_image()
+        self.upload(self.recipes[0], data)
+        self.process_jobs()
+        self.upload(self.recipes[1], data)
+
+        self.upload(self.recipes[0], create_image('blue'))
+
+        self.recipes[1].refresh_from_db()
+        for rendition in self.recipes[1].renditions.values():
+            self.assertTrue(default_storage.exists(rendition['path']))
+
+    def test_renditions_deleted_on_last_replace(self):
+        """Test replacing an unshared image deletes its renditions."""
+        self.upload(self.recipes[0], create_image('red'))
+        self.process_jobs()
+        self.recipes[0].refresh_from_db()
+        renditions = self.recipes[0].renditions
+
+        self.upload(self.recipes[0], create_image('blue'))
+
+        for rendition in renditions.values():
+            self.assertFalse(default_storage.exists(rendition['path']))
+
+    @override_settings(RECIPE_IMAGE_CONTENT_ADDRESSED=False)
+    def test_disabled_stores_every_upload(self):
+        """Test uploads are stored apart when disabled."""
+        data = create_image()
+        for recipe in self.recipes:
+            self.upload(recipe, data)
+
+        self.assertFalse(StoredImage.objects.exists())
+        self.assertNotEqual(
+            self.recipes[0].image.name,
+            self.recipes[1].image.name,
+        )
+        for recipe in self.recipes:
+            self.assertIsNone(recipe.stored_image)
+            self.assertTrue(recipe.image.name.startswith('uploads/recipe/'))
+            self.assertNotIn('sha256', recipe.image.name)
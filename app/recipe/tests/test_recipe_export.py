@@ -0,0 +1,141 @@
+"""
+Tests for the streaming recipe export API.
+"""
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+from recipe.serializers import RecipeSerializer
+from recipe.views import RecipeViewSet
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+        'description': 'Sample description',
+        'link': 'http://example.com/recipe.pdf',
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeExportTests(TestCase):
+    """Test the streaming export."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Tofu')
+        for i in range(5):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.ingredients.add(ingredient)
+            if i % 2:
+                recipe.tags.add(self.tag)
+
+    def expected(self, recipes):
+        """Return the serialized representation of recipes."""
+        recipes = recipes.order_by('-id')
+        return json.loads(json.dumps(
+            RecipeSerializer(recipes, many=True).data,
+        ))
+
+    def test_auth_required(self):
+        """Test auth is required to export recipes."""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_json_array(self):
+        """Test the export streams all the user's recipes as a JSON array."""
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        create_recipe(user=other_user)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        body = b''.join(res.streaming_content)
+        self.assertEqual(
+            json.loads(body),
+            self.expected(Recipe.objects.filter(user=self.user)),
+        )
+
+    def test_export_ndjson(self):
+        """Test the export streams one recipe per line."""
+        res = self.client.get(EXPORT_URL, {'output': 'ndjson'})
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            self.expected(Recipe.objects.filter(user=self.user)),
+        )
+
+    def test_export_across_chunks(self):
+        """Test chunk boundaries produce valid output in both formats."""
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            array = self.client.get(EXPORT_URL)
+            body = b''.join(array.streaming_content)
+            ndjson = self.client.get(EXPORT_URL, {'output': 'ndjson'})
+            lines = b''.join(ndjson.streaming_content).decode().splitlines()
+
+        expected = self.expected(Recipe.objects.filter(user=self.user))
+        self.assertEqual(json.loads(body), expected)
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_export_empty(self):
+        """Test an export without recipes is an empty array."""
+        Recipe.objects.all().delete()
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(b''.join(res.streaming_content), b'[]')
+
+    def test_export_filters_and_fields(self):
+        """Test the export applies the list filters and sparse fields."""
+        res = self.client.get(EXPORT_URL, {
+            'tags': str(self.tag.id),
+            'fields': 'id,title',
+        })
+
+        recipes = Recipe.objects.filter(tags=self.tag).order_by('-id')
+        self.assertEqual(
+            json.loads(b''.join(res.streaming_content)),
+            [{'id': recipe.id, 'title': recipe.title} for recipe in recipes],
+        )
+
+    def test_export_invalid_output(self):
+        """Test an unknown output format returns a 400."""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('output', res.data)
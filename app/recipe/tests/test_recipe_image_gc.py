@@ -0,0 +1,179 @@
+"""
+Tests for collecting orphaned recipe image files.
+"""
+import os
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.utils import timezone
+
+from core.models import (
+    ImageJob,
+    Recipe,
+    StoredImage,
+)
+from recipe import images
+
+
+SHA256 = 'cd' * 32
+
+
+class CollectRecipeImagesCommandTests(TestCase):
+    """Test the collect_recipe_images command."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+
+    def write(self, path, age_hours=48):
+        """Write a file last modified age_hours ago, return its path."""
+        default_storage.save(path, ContentFile(b'x' * 1024))
+        modified = time.time() - age_hours * 3600
+        os.utime(default_storage.path(path), (modified, modified))
+
+        return path
+
+    def create_recipe(self, image, **params):
+        """Create and return a recipe with an image."""
+        return Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+            image=image,
+            **params,
+        )
+
+    def collect(self, **options):
+        """Run the command and return its output."""
+        out = StringIO()
+        call_command(
+            'collect_recipe_images',
+            stdout=out,
+            stderr=out,
+            **options,
+        )
+
+        return out.getvalue()
+
+    def test_unreferenced_files_deleted(self):
+        """Test old files nothing refers to are deleted."""
+        image = self.write('uploads/recipe/ab/cd/abcd-kept.jpg')
+        thumbnail = self.write(
+            'uploads/recipe/renditions/ab/cd/abcd-kept/thumbnail.jpg',
+        )
+        self.create_recipe(
+            image,
+            thumbnail=thumbnail,
+            renditions={
+                'thumbnail': {'path': thumbnail, 'width': 1, 'height': 1},
+            },
+        )
+        job_source = self.write('uploads/recipe/12/34/1234-job.jpg')
+        ImageJob.objects.create(
+            recipe=self.create_recipe(job_source),
+            source=job_source,
+        )
+        orphans = [
+            self.write('uploads/recipe/ab/cd/abcd-replaced.jpg'),
+            self.write('uploads/recipe/flat-deleted.jpg'),
+            self.write(
+                'uploads/recipe/renditions/ab/cd/abcd-replaced/medium.jpg',
+            ),
+        ]
+        recent = self.write('uploads/recipe/ab/cd/abcd-new.jpg', age_hours=1)
+
+        out = self.collect()
+
+        self.assertIn('Deleted 3 of 7 files, 0.0 MB', out)
+        for path in orphans:
+            self.assertFalse(default_storage.exists(path))
+        for path in [image, thumbnail, job_source, recent]:
+            self.assertTrue(default_storage.exists(path))
+
+    def test_dry_run(self):
+        """Test nothing is deleted in a dry run."""
+        orphan = self.write('uploads/recipe/ab/cd/abcd-orphan.jpg')
+
+        out = self.collect(dry_run=True)
+
+        self.assertIn('Would delete 1 of 1 files', out)
+        self.assertTrue(default_storage.exists(orphan))
+
+    def test_grace_period(self):
+        """Test files younger than the grace period are kept."""
+        orphan = self.write('uploads/recipe/ab/cd/abcd-orphan.jpg', 3)
+
+        self.collect(grace_hours=6)
+        self.assertTrue(default_storage.exists(orphan))
+
+        self.collect(grace_hours=2)
+        self.assertFalse(default_storage.exists(orphan))
+
+    def test_unused_stored_images_deleted(self):
+        """Test stored images without recipes are deleted with their files."""
+        image = self.write(f'uploads/recipe/sha256/cd/cd/{SHA256}.jpg')
+        thumbnail = self.write(
+            images.rendition_path(image, 'thumbnail', 'JPEG'),
+        )
+        StoredImage.objects.create(sha256=SHA256, image=image, size=1024)
+        StoredImage.objects.update(
+            created_at=timezone.now() - timedelta(days=2),
+        )
+
+        out = self.collect()
+
+        self.assertIn('Deleted 1 unused stored images.', out)
+        self.assertFalse(StoredImage.objects.exists())
+        self.assertFalse(default_storage.exists(image))
+        self.assertFalse(default_storage.exists(thumbnail))
+
+    def test_used_stored_images_kept(self):
+        """Test stored images with recipes or references are kept."""
+        used = self.write(f'uploads/recipe/sha256/cd/cd/{SHA256}.jpg')
+        stored_image = StoredImage.objects.create(
+            sha256=SHA256,
+            image=used,
+            size=1024,
+        )
+        # Out of date counts do not matter while a recipe uses the image.
+        self.create_recipe(used, stored_image=stored_image)
+        other_sha256 = 'ef' * 32
+        referenced = self.write(
+            f'uploads/recipe/sha256/ef/ef/{other_sha256}.jpg',
+        )
+        StoredImage.objects.create(
+            sha256=other_sha256,
+            image=referenced,
+            size=1024,
+            ref_count=1,
+        )
+        StoredImage.objects.update(
+            created_at=timezone.now() - timedelta(days=2),
+        )
+
+        out = self.collect()
+
+        self.assertIn('Deleted 0 unused stored images.', out)
+        self.assertEqual(StoredImage.objects.count(), 2)
+        self.assertTrue(default_storage.exists(used))
+        self.assertTrue(default_storage.exists(referenced))
@@ -0,0 +1,229 @@
+"""
+Tests for moving recipe images into sharded directories.
+"""
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    override_settings,
+)
+
+from core.models import (
+    ImageJob,
+    Recipe,
+    StoredImage,
+)
+
+
+SHA256 = 'ab' * 32
+
+
+@override_settings(RECIPE_LIST_CACHE_TIMEOUT=0)
+class ShardRecipeImagesCommandTests(TestCase):
+    """Test the shard_recipe_images command."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+
+    def write(self, path):
+        """Write a file at a storage path unless it exists, return the path."""
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(path.encode()))
+
+        return path
+
+    def create_recipe(self, image, stored_image=None):
+        """Create a recipe with an image and its renditions, written flat."""
+        stem = os.path.splitext(os.path.basename(image))[0]
+        renditions = {
+            name: {
+                'path': self.write(f'uploads/recipe/renditions/{stem}/{name}'),
+                'width': 160,
+                'height': 160,
+            }
+            for name in ['thumbnail.jpg', 'medium.webp']
+        }
+        return Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+            image=self.write(image),
+            thumbnail=renditions['thumbnail.jpg']['path'],
+            renditions=renditions,
+            stored_image=stored_image,
+        )
+
+    def shard(self, batch_size=1):
+        """Run the command and return its output."""
+        out = StringIO()
+        call_command(
+            'shard_recipe_images',
+            batch_size=batch_size,
+            stdout=out,
+            stderr=out,
+        )
+
+        return out.getvalue()
+
+    def test_recipe_images_moved(self):
+        """Test images and renditions are moved and their paths rewritten."""
+        recipes = [
+            self.create_recipe(f'uploads/recipe/{prefix}-uuid.jpg')
+            for prefix in ['1234', '5678', '9abc']
+        ]
+
+        out = self.shard(batch_size=2)
+
+        self.assertIn('Moved 3 images, skipped 0', out)
+        recipe = Recipe.objects.get(pk=recipes[0].pk)
+        self.assertEqual(
+            recipe.image.name,
+            'uploads/recipe/12/34/1234-uuid.jpg',
+        )
+        self.assertEqual(
+            recipe.thumbnail.name,
+            'uploads/recipe/renditions/12/34/1234-uuid/thumbnail.jpg',
+        )
+        self.assertEqual(
+            recipe.renditions['medium.webp']['path'],
+            'uploads/recipe/renditions/12/34/1234-uuid/medium.webp',
+        )
+        with default_storage.open(recipe.image.name) as image:
+            self.assertEqual(image.read(), b'uploads/recipe/1234-uuid.jpg')
+        self.assertFalse(default_storage.exists(
+            'uploads/recipe/1234-uuid.jpg',
+        ))
+        renditions = os.path.join(
+            settings.MEDIA_ROOT,
+            'uploads/recipe/renditions',
+        )
+        self.assertEqual(sorted(os.listdir(renditions)), ['12', '56', '9a'])
+
+    def test_rerun_moves_nothing(self):
+        """Test moved images are not moved again."""
+        self.create_recipe('uploads/recipe/1234-uuid.jpg')
+        self.shard()
+
+        out = self.shard()
+
+        self.assertIn('Moved 0 images, skipped 0', out)
+
+    def test_pending_job_skipped(self):
+        """Test a recipe with a pending image job is not moved."""
+        recipe = self.create_recipe('uploads/recipe/1234-uuid.jpg')
+        ImageJob.objects.create(recipe=recipe, source=recipe.image.name)
+
+        out = self.shard()
+
+        self.assertIn('Moved 0 images, skipped 1', out)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, 'uploads/recipe/1234-uuid.jpg')
+        self.assertTrue(default_storage.exists(recipe.image.name))
+
+    def test_stored_image_moved(self):
+        """Test a shared stored image is moved with the recipes using it."""
+        stored_image = StoredImage.objects.create(
+            sha256=SHA256,
+            image=f'uploads/recipe/sha256/{SHA256}.jpg',
+            size=10,
+            ref_count=2,
+        )
+        recipes = [
+            self.create_recipe(stored_image.image.name, stored_image)
+            for _ in range(2)
+        ]
+
+        out = self.shard()
+
+        self.assertIn('Moved 3 images, skipped 0', out)
+        new_path = f'uploads/recipe/sha256/ab/ab/{SHA256}.jpg'
+        stored_image.refresh_from_db()
+        self.assertEqual(stored_image.image.name, new_path)
+        for recipe in recipes:
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.image.name, new_path)
+            self.assertTrue(default_storage.exists(recipe.thumbnail.name))
+        self.assertFalse(default_storage.exists(
+            f'uploads/recipe/sha256/{SHA256}.jpg',
+        ))
+        self.assertFalse(default_storage.exists(
+            f'uploads/recipe/renditions/{SHA256}/thumbnail.jpg',
+        ))
+
+    def test_stored_image_in_use_skipped(self):
+        """Test a stored image is not moved while a recipe uses its path."""
+        stored_image = StoredImage.objects.create(
+            sha256=SHA256,
+            image=f'uploads/recipe/sha256/{SHA256}.jpg',
+            size=10,
+            ref_count=1,
+        )
+        recipe = self.create_recipe(stored_image.image.name, stored_image)
+        ImageJob.objects.create(recipe=recipe, source=recipe.image.name)
+
+        out = self.shard()
+
+        self.assertIn('Moved 0 images, skipped 2', out)
+        stored_image.refresh_from_db()
+        self.assertEqual(
+            stored_image.image.name,
+            f'uploads/recipe/sha256/{SHA256}.jpg',
+        )
+        self.assertTrue(default_storage.exists(stored_image.image.name))
+
+    @override_settings(RECIPE_LIST_CACHE_TIMEOUT=60)
+    def test_old_files_kept_until_cached_pages_expire(self):
+        """Test old files outlive the pages cached by other processes."""
+        old = 'uploads/recipe/1234-uuid.jpg'
+        self.create_recipe(old)
+        waits = []
+
+        def sleep(seconds):
+            waits.append((seconds, default_storage.exists(old)))
+
+        with patch(
+            'core.management.commands.shard_recipe_images.time.sleep',
+            side_effect=sleep,
+        ):
+            self.shard()
+
+        self.assertGreater(waits[-1][0], 50)
+        self.assertTrue(waits[-1][1])
+        self.assertFalse(default_storage.exists(old))
+
+    @override_settings(RECIPE_LIST_CACHE_TIMEOUT=60)
+    def test_old_files_deleted_with_shared_cache(self):
+        """Test old files are deleted at once when the cache is shared."""
+        self.create_recipe('uploads/recipe/1234-uuid.jpg')
+
+        with patch(
+            'core.management.commands.shard_recipe_images.is_shared',
+            return_value=True,
+        ), patch(
+            'core.management.commands.shard_recipe_images.time.sleep',
+        ) as sleep:
+            self.shard(batch_size=2)
+
+        sleep.assert_not_called()
+        self.assertFalse(default_storage.exists(
+            'uploads/recipe/1234-uuid.jpg',
+        ))
@@ -0,0 +1,218 @@
+"""
+Tests for the rendition pipeline of recipe images.
+"""
+import os
+import tempfile
+from decimal import Decimal
+from io import (
+    BytesIO,
+    StringIO,
+)
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    ImageJob,
+    Recipe,
+)
+from recipe import images
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+class RecipeImageTests(TestCase):
+    """Test renditions are rendered by the image jobs."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        cache.clear()
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+
+    def upload(self, size=(1200, 600)):
+        """Upload an image to the recipe."""
+        image_file = BytesIO()
+        Image.new('RGB', size, 'red').save(image_file, format='JPEG')
+        image_file.name = 'photo.jpg'
+        image_file.seek(0)
+
+        res = self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': image_file},
+            format='multipart',
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+
+    def process_jobs(self):
+        """Run the image jobs."""
+        out = StringIO()
+        call_command('process_image_jobs', once=True, stdout=out, stderr=out)
+        self.recipe.refresh_from_db()
+
+        return out.getvalue()
+
+    def test_upload_queues_job(self):
+        """Test uploading an image queues its renditions."""
+        self.upload()
+
+        job = ImageJob.objects.get(recipe=self.recipe)
+        self.assertEqual(job.source, self.recipe.image.name)
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.data['renditions'], {})
+        self.assertIsNone(res.data['thumbnail'])
+
+    def test_process_jobs(self):
+        """Test the jobs render every rendition."""
+        self.upload()
+
+        output = self.process_jobs()
+
+        self.assertIn('Processed 1 image jobs, 0 failed.', output)
+        self.assertFalse(ImageJob.objects.exists())
+        res = self.client.get(detail_url(self.recipe.id))
+        renditions = res.data['renditions']
+        self.assertEqual(set(renditions), set(images.RENDITIONS))
+        self.assertEqual(
+            (renditions['thumbnail']['width'],
+             renditions['thumbnail']['height']),
+            (160, 160),
+        )
+        self.assertEqual(
+            (renditions['medium']['width'], renditions['medium']['height']),
+            (800, 400),
+        )
+        self.assertTrue(renditions['medium_webp']['url'].startswith('http'))
+        self.assertTrue(res.data['thumbnail'].endswith('thumbnail.jpg'))
+        path = self.recipe.renditions['medium_webp']['path']
+        with default_storage.open(path) as rendition:
+            self.assertEqual(Image.open(rendition).format, 'WEBP')
+
+    def test_thumbnail_in_list(self):
+        """Test the cached list shows the thumbnail once it is ready."""
+        self.upload()
+        before = self.client.get(RECIPES_URL)
+
+        self.process_jobs()
+        after = self.client.get(RECIPES_URL)
+
+        self.assertIsNone(before.data['results'][0]['thumbnail'])
+        self.assertEqual(
+            after.data['results'][0]['thumbnail'],
+            'http://testserver' + self.recipe.thumbnail.url,
+        )
+
+    @override_settings(RECIPE_FAST_LIST_SERIALIZATION=True)
+    def test_thumbnail_in_fast_list(self):
+        """Test the fast list path renders the thumbnail URL."""
+        self.upload()
+        self.process_jobs()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            res.data['results'][0]['thumbnail'],
+            'http://testserver' + self.recipe.thumbnail.url,
+        )
+
+    def test_new_upload_replaces_renditions(self):
+        """Test a new image drops the renditions of the previous one."""
+        self.upload()
+        self.process_jobs()
+        previous = self.recipe.renditions
+
+        self.upload(size=(300, 300))
+
+        self.assertEqual(self.recipe.renditions, {})
+        self.assertFalse(self.recipe.thumbnail)
+        for rendition in previous.values():
+            self.assertFalse(default_storage.exists(rendition['path']))
+        self.process_jobs()
+        self.assertEqual(self.recipe.renditions['medium']['width'], 300)
+
+    def test_stale_job_dropped(self):
+        """Test a job for a replaced image renders nothing."""
+        self.upload()
+        job = ImageJob.objects.get()
+        self.upload()
+        ImageJob.objects.create(recipe=self.recipe, source=job.source)
+        stale_dir = os.path.dirname(images.rendition_path(
+            job.source, 'medium', 'JPEG',
+        ))
+
+        self.process_jobs()
+
+        self.assertFalse(default_storage.exists(stale_dir))
+        self.assertTrue(self.recipe.renditions)
+
+    def test_failed_job_retried(self):
+        """Test a failing job is retried later, then marked as failed."""
+        job = ImageJob.objects.create(recipe=self.recipe, source='missing')
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='missing')
+
+        output = self.process_jobs()
+
+        job.refresh_from_db()
+        self.assertIn('1 failed', output)
+        self.assertEqual(job.status, ImageJob.Status.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.available_at, timezone.now())
+
+        ImageJob.objects.filter(pk=job.pk).update(
+            attempts=images.MAX_ATTEMPTS - 1,
+            available_at=timezone.now(),
+        )
+        self.process_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.Status.FAILED)
+
+    def test_claimed_jobs_leased(self):
+        """Test a claimed job is not handed to another worker."""
+        job = ImageJob.objects.create(recipe=self.recipe, source='image.jpg')
+
+        claimed = images.claim_jobs(10)
+
+        self.assertEqual(claimed, [job])
+        self.assertEqual(images.claim_jobs(10), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.Status.RUNNING)
@@ -0,0 +1,254 @@
+"""
+Tests for the number of queries issued by the recipe APIs.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, tag_count=2, ingredient_count=2, **params):
+    """Create and return a sample recipe with tags and ingredients."""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    for i in range(tag_count):
+        tag, _ = Tag.objects.get_or_create(user=user, name=f'Tag {i}')
+        recipe.tags.add(tag)
+    for i in range(ingredient_count):
+        ingredient, _ = Ingredient.objects.get_or_create(
+            user=user,
+            name=f'Ingredient {i}',
+        )
+        recipe.ingredients.add(ingredient)
+
+    return recipe
+
+
+class RecipeQueryCountTests(TestCase):
+    """Test the query budget of each recipe endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_queries_constant(self):
+        """Test listing recipes does not issue queries per recipe."""
+        for _ in range(10):
+            create_recipe(user=self.user)
+
+        # recipes, tags, ingredients
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 10)
+        self.assertEqual(len(res.data['results'][0]['tags']), 2)
+
+    def test_list_queries_with_filters(self):
+        """Test filtering recipes keeps the query budget."""
+        recipe = create_recipe(user=self.user)
+        tag = recipe.tags.first()
+        ingredient = recipe.ingredients.first()
+
+        params = {'tags': f'{tag.id}', 'ingredients': f'{ingredient.id}'}
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_retrieve_queries(self):
+        """Test retrieving a recipe loads tags and ingredients in bulk."""
+        recipe = create_recipe(user=self.user, tag_count=5)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 5)
+
+    def test_create_queries(self):
+        """Test the query budget for creating a recipe."""
+        payload = {
+            'title': 'Thai Prawn Curry',
+            'time_minutes': 30,
+            'price': Decimal('2.50'),
+            'tags': [{'name': 'Thai'}, {'name': 'Dinner'}],
+            'ingredients': [{'name': 'Prawns'}, {'name': 'Ginger'}],
+        }
+
+        with self.assertNumQueries(11):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['tags']), 2)
+
+    def test_create_queries_independent_of_items(self):
+        """Test tags and ingredients are resolved as a set."""
+        Ingredient.objects.create(user=self.user, name='Ingredient 0')
+        payload = {
+            'title': 'Thai Prawn Curry',
+            'time_minutes': 30,
+            'price': Decimal('2.50'),
+            'tags': [{'name': f'Tag {i}'} for i in range(10)],
+            'ingredients': [{'name': f'Ingredient {i}'} for i in range(20)],
+        }
+
+        with self.assertNumQueries(11):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['ingredients']), 20)
+        self.assertEqual(Ingredient.objects.count(), 20)
+
+    def test_update_queries(self):
+        """Test the query budget for updating a recipe."""
+        recipe = create_recipe(user=self.user)
+        payload = {
+            'title': 'New title',
+            'tags': [{'name': 'Lunch'}, {'name': 'Tag 0'}],
+        }
+
+        with self.assertNumQueries(11):
+            res = self.client.patch(
+                detail_url(recipe.id),
+                payload,
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 2)
+
+    def test_update_unchanged_writes_nothing(self):
+        """Test a PATCH which changes nothing does not write."""
+        recipe = create_recipe(user=self.user)
+        payload = {
+            'title': recipe.title,
+            'tags': [{'name': 'Tag 1'}, {'name': 'Tag 0'}],
+            'ingredients': [
+                {'name': 'Ingredient 0'},
+                {'name': 'Ingredient 1'},
+            ],
+        }
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.patch(
+                detail_url(recipe.id),
+                payload,
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        writes = [
+            query['sql'] for query in context.captured_queries
+            if not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(writes, [])
+
+    def test_update_writes_only_changes(self):
+        """Test only the changed through rows and columns are written."""
+        recipe = create_recipe(user=self.user)
+        Through = Recipe.tags.through
+        kept = Through.objects.get(recipe=recipe, tag__name='Tag 0')
+        payload = {
+            'price': '7.50',
+            'tags': [{'name': 'Tag 0'}, {'name': 'Lunch'}],
+        }
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.patch(
+                detail_url(recipe.id),
+                payload,
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(Through.objects.filter(id=kept.id).exists())
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Lunch', 'Tag 0'],
+        )
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"price"', updates[0])
+        self.assertIn('"updated_at"', updates[0])
+        self.assertNotIn('"title"', updates[0])
+        self.assertNotIn('"search_vector"', updates[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.price, Decimal('7.50'))
+
+    def test_list_sparse_fields_skip_relations(self):
+        """Test ?fields= without relations skips the prefetch queries."""
+        create_recipe(user=self.user, description='Long description')
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data['results'][0]), ['id', 'title'])
+
+    def test_list_sparse_fields_trim_columns(self):
+        """Test ?fields= only selects the requested columns."""
+        create_recipe(user=self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(RECIPES_URL, {'fields': 'title,tags'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(context.captured_queries), 2)
+        sql = context.captured_queries[0]['sql']
+        self.assertNotIn('"link"', sql)
+        self.assertNotIn('"description"', sql)
+        self.assertEqual(list(res.data['results'][0]), ['title', 'tags'])
+
+    def test_retrieve_sparse_fields(self):
+        """Test ?fields= on the detail endpoint."""
+        recipe = create_recipe(user=self.user)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(
+                detail_url(recipe.id),
+                {'fields': 'description,ingredients'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data), ['ingredients', 'description'])
+
+    def test_sparse_fields_invalid(self):
+        """Test unknown fields return 400."""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,description'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
@@ -0,0 +1,195 @@
+"""
+Tests for the streaming validation of image uploads.
+"""
+import os
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import SkipFile
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe import uploads
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def create_image(size=(10, 10), image_format='PNG', noise=False):
+    """Return an image file."""
+    if noise:
+        image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+    else:
+        image = Image.new('RGB', size, 'blue')
+    image_file = BytesIO()
+    image.save(image_file, format=image_format)
+    image_file.name = f'photo.{image_format.lower()}'
+    image_file.seek(0)
+
+    return image_file
+
+
+class ImageUploadHandlerTests(TestCase):
+    """Test the upload handler on its own."""
+
+    def test_sniff_format(self):
+        """Test formats are recognised from their leading bytes."""
+        self.assertEqual(uploads.sniff_format(b'\xff\xd8\xff\xe0'), 'JPEG')
+        self.assertEqual(
+            uploads.sniff_format(b'RIFF\x00\x00\x00\x00WEBPVP8 '),
+            'WEBP',
+        )
+        self.assertIsNone(uploads.sniff_format(b'<html><body>'))
+
+    def test_streams_to_temporary_file(self):
+        """Test chunks are written to disk and the header is checked."""
+        data = create_image(size=(50, 50)).getvalue()
+        handler = uploads.ImageUploadHandler(max_bytes=len(data))
+        handler.new_file('image', 'photo.png', 'image/png', len(data))
+
+        for start in range(0, len(data), 16):
+            handler.receive_data_chunk(data[start:start + 16], start)
+        upload = handler.file_complete(len(data))
+
+        self.assertIsInstance(upload, TemporaryUploadedFile)
+        self.assertEqual(upload.read(), data)
+        upload.close()
+
+    def test_rejects_on_first_chunk(self):
+        """Test a file which is not an image is dropped at once."""
+        handler = uploads.ImageUploadHandler(max_bytes=1000)
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b'#!/bin/sh\necho hello\n', 0)
+
+        self.assertEqual(handler.error, uploads.INVALID_IMAGE)
+
+
+class ImageUploadApiTests(TestCase):
+    """Test the limits of the image upload API."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = self.create_recipe()
+
+    def create_recipe(self, **params):
+        """Create and return a recipe."""
+        return Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=10,
+            price=Decimal('5.00'),
+            **params,
+        )
+
+    def upload(self, image_file):
+        """Upload a file to the recipe."""
+        return self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': image_file},
+            format='multipart',
+        )
+
+    def test_upload_records_size(self):
+        """Test a valid upload is stored with its size."""
+        image_file = create_image()
+
+        res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_size, len(image_file.getvalue()))
+
+    def test_not_an_image(self):
+        """Test a file which is not an image is rejected."""
+        text_file = BytesIO(b'this is not an image, only some text')
+        text_file.name = 'photo.jpg'
+
+        res = self.upload(text_file)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'], [uploads.INVALID_IMAGE])
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_truncated_image(self):
+        """Test an image with a valid signature but no header is rejected."""
+        image_file = BytesIO(create_image().getvalue()[:20])
+        image_file.name = 'photo.png'
+
+        res = self.upload(image_file)
+
+        self.assertEqual(res.data['image'], [uploads.INVALID_IMAGE])
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=1_000_000)
+    def test_too_many_pixels(self):
+        """Test images with too many pixels are rejected from the header."""
+        res = self.upload(create_image(size=(2000, 1000)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('2000x1000', res.data['image'][0])
+
+    def test_too_large(self):
+        """Test uploads over the size limit are rejected while streaming."""
+        image_file = create_image(size=(40, 40), noise=True)
+        size = len(image_file.getvalue())
+
+        with override_settings(RECIPE_IMAGE_MAX_BYTES=size - 1):
+            res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('larger than', res.data['image'][0])
+
+    @override_settings(RECIPE_IMAGE_MAX_BYTES=1000)
+    def test_too_large_content_length(self):
+        """Test bodies far over the size limit are rejected unread."""
+        res = self.upload(create_image(size=(200, 200), noise=True))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('larger than', res.data['image'][0])
+
+    @override_settings(RECIPE_IMAGE_QUOTA_BYTES=2000)
+    def test_quota(self):
+        """Test uploads beyond the storage quota of the user are rejected."""
+        self.create_recipe(image='other.png', image_size=1500)
+        image_file = create_image(size=(40, 40), noise=True)
+
+        res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('quota', res.data['image'][0])
+
+    @override_settings(RECIPE_IMAGE_QUOTA_BYTES=2000)
+    def test_quota_excludes_replaced_image(self):
+        """Test the image being replaced does not count against the quota."""
+        Recipe.objects.filter(pk=self.recipe.pk).update(image_size=1500)
+
+        res = self.upload(create_image())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -21,6 +21,7 @@ from recipe.serializers import TagSerializer
 
 # 91
 TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
 
 
 # 93
@@ -72,7 +73,7 @@ class PrivateTagsApiTests(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True) # Listオブジェクトの場合はmany=Trueとすることで配列で取得できる
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     # 91 非認証ユーザのcreateは通らないテスト
     def test_tags_limited_to_user(self):
@@ -84,9 +85,9 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
 
     # 93 Write tests for updating tags
     def test_update_tag(self):
@@ -130,8 +131,8 @@ class PrivateTagsApiTests(TestCase):
 
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     # 132 Add tests for filtering tags and ingredients
     def test_filtered_tags_unique(self):
@@ -155,4 +156,76 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tags_paginated_by_name(self):
+        """Test tags are paginated in name order without gaps."""
+        names = ['Dinner', 'Breakfast', 'Supper', 'Lunch']
+        for name in names:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 3})
+        self.assertIsNotNone(res.data['next'])
+        res2 = self.client.get(res.data['next'])
+
+        listed = [tag['name'] for tag in
+                  res.data['results'] + res2.data['results']]
+        self.assertEqual(listed, sorted(names, reverse=True))
+        self.assertIsNone(res2.data['next'])
+
+    def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to an existing name returns an error."""
+        Tag.objects.create(user=self.user, name='Dinner')
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dinner'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Lunch')
+
+    def test_bulk_rename_and_delete_tags(self):
+        """Test the bulk endpoints on tags."""
+        tags = [
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+            for i in range(3)
+        ]
+
+        renamed = self.client.patch(TAGS_BULK_URL, {'items': [
+            {'id': tags[0].id, 'name': 'Vegan'},
+        ]}, format='json')
+        deleted = self.client.delete(TAGS_BULK_URL, {
+            'ids': [tags[1].id, tags[2].id],
+        }, format='json')
+
+        self.assertEqual(renamed.data, {'updated': 1})
+        self.assertEqual(deleted.data, {'deleted': 2})
+        self.assertEqual(
+            list(Tag.objects.values_list('name', flat=True)),
+            ['Vegan'],
+        )
+
+    def test_merge_tags(self):
+        """Test merging tags without loading recipes."""
+        target = Tag.objects.create(user=self.user, name='Dinner')
+        sources = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['dinner', 'Supper']
+        ]
+        recipe = Recipe.objects.create(
+            title='Curry',
+            time_minutes=30,
+            price=Decimal('5.00'),
+            user=self.user,
+        )
+        recipe.tags.add(*sources)
+        url = reverse('recipe:tag-merge', args=[target.id])
+
+        # target, savepoint, UPDATE, delete of the sources (3), release
+        with self.assertNumQueries(7):
+            res = self.client.post(url, {
+                'ids': [tag.id for tag in sources],
+            }, format='json')
+
+        self.assertEqual(res.data, {'merged': 2, 'recipes': 1})
+        self.assertEqual(list(recipe.tags.all()), [target])
@@ -0,0 +1,159 @@
+"""
+Streaming validation of recipe image uploads.
+
+ImageUploadHandler writes uploads to a temporary file chunk by chunk, so
+an upload never sits in memory. It rejects an upload as soon as its first
+bytes are not a supported image format or it grows past the size limit,
+which includes the remaining storage quota of the user. Once the file is
+complete, only the image header is read to reject decompression bombs,
+before anything decodes the pixels.
+"""
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    SkipFile,
+    TemporaryFileUploadHandler,
+)
+from django.db.models import Sum
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+
+# Formats by their leading bytes, WebP is checked apart.
+SIGNATURES = {
+    b'\xff\xd8\xff': 'JPEG',
+    b'\x89PNG\r\n\x1a\n': 'PNG',
+    b'GIF87a': 'GIF',
+    b'GIF89a': 'GIF',
+}
+SIGNATURE_BYTES = 12
+# Room for the multipart boundaries and headers around the image.
+MULTIPART_OVERHEAD = 64 * 1024
+
+INVALID_IMAGE = 'Upload a JPEG, PNG, GIF or WebP image.'
+
+
+def sniff_format(head):
+    """Return the image format of the leading bytes of a file, or None."""
+    for signature, image_format in SIGNATURES.items():
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+
+    return None
+
+
+def get_quota_left(user, recipe=None):
+    """Return how many bytes of images the user may still store."""
+    if not settings.RECIPE_IMAGE_QUOTA_BYTES:
+        return None
+
+    # The image of the recipe is replaced, so it does not count.
+    used = Recipe.objects.filter(user=user).exclude(
+        pk=getattr(recipe, 'pk', None),
+    ).aggregate(total=Sum('image_size'))['total'] or 0
+
+    return max(settings.RECIPE_IMAGE_QUOTA_BYTES - used, 0)
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Stream an image upload to a temporary file, validating it early."""
+
+    def __init__(self, request=None, max_bytes=None, quota_left=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes or settings.RECIPE_IMAGE_MAX_BYTES
+        self.quota_left = quota_left
+        self.error = None
+
+    @classmethod
+    def install(cls, request, recipe):
+        """Use the handler for the files of a DRF request."""
+        handler = cls(
+            request._request,
+            quota_left=get_quota_left(request.user, recipe),
+        )
+        # Reject bodies which cannot fit before reading any of them.
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if content_length > handler.limit + MULTIPART_OVERHEAD:
+            raise ValidationError({'image': [handler.limit_message]})
+        request._request.upload_handlers = [handler]
+
+        return handler
+
+    @property
+    def limit(self):
+        """Return the largest acceptable upload in bytes."""
+        if self.quota_left is None:
+            return self.max_bytes
+
+        return min(self.max_bytes, self.quota_left)
+
+    @property
+    def limit_message(self):
+        """Return why an upload over the limit is rejected."""
+        if self.limit < self.max_bytes:
+            return (
+                'Image exceeds your storage quota, '
+                f'{self.quota_left} bytes left.'
+            )
+
+        return f'Image is larger than {self.max_bytes} bytes.'
+
+    def reject(self, message):
+        """Drop the current file and remember why."""
+        self.error = message
+        self.upload_interrupted()
+        raise SkipFile(message)
+
+    def new_file(self, *args, **kwargs):
+        """Start a file."""
+        super().new_file(*args, **kwargs)
+        self.head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        """Check the chunk before writing it to the temporary file."""
+        if start + len(raw_data) > self.limit:
+            self.reject(self.limit_message)
+        if len(self.head) < SIGNATURE_BYTES:
+            self.head += raw_data[:SIGNATURE_BYTES - len(self.head)]
+            if len(self.head) == SIGNATURE_BYTES and not sniff_format(
+                self.head,
+            ):
+                self.reject(INVALID_IMAGE)
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        """Check the image header and return the file if it is valid."""
+        upload = super().file_complete(file_size)
+        error = self.check_header(upload)
+        if error:
+            self.error = error
+            self.upload_interrupted()
+            return None
+
+        upload.seek(0)
+        return upload
+
+    def check_header(self, upload):
+        """Return why the header of an image is invalid, if it is."""
+        if not sniff_format(self.head):
+            return INVALID_IMAGE
+        try:
+            # Only reads the header, the pixels are decoded on demand.
+            with Image.open(upload.temporary_file_path()) as image:
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            return INVALID_IMAGE
+
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            return (
+                f'Image has {width}x{height} pixels, more than '
+                f'{settings.RECIPE_IMAGE_MAX_PIXELS}.'
+            )
+
+        return None
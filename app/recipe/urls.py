@@ -25,5 +25,6 @@ router.register('ingredients', views.IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('cache-stats/', views.list_cache_stats, name='cache-stats'),
 ]
@@ -2,61 +2,185 @@
 Views for the recipe APIs
 """
 # 131 Implement recipe filter feature
+import uuid
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
+    inline_serializer,
     OpenApiParameter,
     OpenApiTypes,
 )
 
+from django.conf import settings
+from django.db import (
+    IntegrityError,
+    transaction,
+)
+from django.db.models import (
+    Case,
+    CharField,
+    Prefetch,
+    Value,
+    When,
+)
+from django.db.models.functions import (
+    Cast,
+    Concat,
+)
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
 from rest_framework import (
     viewsets,
     mixins, # 92
+    serializers as drf_serializers,
     status, # 126
 )
-from rest_framework.decorators import action # 126
+from rest_framework.decorators import (
+    action, # 126
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response # 126
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import (
+    IsAuthenticated,
+    IsAdminUser,
+)
 
 from core.models import (
     Recipe,
     Tag, # 92
     Ingredient, # 107
 )
-from recipe import serializers
+from recipe import (
+    fast,
+    filters,
+    images,
+    serializers,
+    uploads,
+)
+from recipe.cache import (
+    CachedListMixin,
+    ConditionalGetMixin,
+    get_stats,
+)
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+
+
+RECIPE_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        'tags',
+        OpenApiTypes.STR, # String
+        description='Comma separated list of tag IDs to filter',
+    ),
+    OpenApiParameter(
+        'ingredients',
+        OpenApiTypes.STR,
+        description='Comma separated list of ingredient IDs to filter',
+    ),
+    OpenApiParameter(
+        'search',
+        OpenApiTypes.STR,
+        description=(
+            'Full text search on title and description, '
+            'results are ordered by relevance'
+        ),
+    ),
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields to return',
+    ),
+    OpenApiParameter(
+        'match',
+        OpenApiTypes.STR,
+        enum=filters.MATCH_CHOICES,
+        description=(
+            'Return recipes matching any (default) or all of the '
+            'given tags and ingredients'
+        ),
+    ),
+]
 
 
 # ModelViewsetはとりわけModelとの連動を強化した親クラス。
 @extend_schema_view( # 131 Implement recipe filter featureで追加
     list=extend_schema( # ここでlistエンドポイントであることを指定
-        parameters=[
-            OpenApiParameter(
-                'tags',
-                OpenApiTypes.STR, # String
-                description='Comma separated list of tag IDs to filter',
-            ),
+        parameters=RECIPE_FILTER_PARAMETERS,
+    ),
+    export=extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS + [
             OpenApiParameter(
-                'ingredients',
+                'output',
                 OpenApiTypes.STR,
-                description='Comma separated list of ingredient IDs to filter',
-            )
-        ]
-    )
+                enum=filters.OUTPUT_CHOICES,
+                description=(
+                    'Stream a JSON array (default) or newline delimited '
+                    'JSON objects'
+                ),
+            ),
+        ],
+        responses=serializers.RecipeSerializer(many=True),
+    ),
+    bulk=extend_schema(
+        request=serializers.RecipeSerializer(many=True),
+        responses={201: serializers.RecipeSerializer(many=True)},
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin,
+                    CachedListMixin,
+                    fast.FastListMixin,
+                    viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     # serializer_class = serializers.RecipeSerializer
     serializer_class = serializers.RecipeDetailSerializer # Detailの方がCRUD全てを使うので、RecipeSerializerではなくこちらをデフォルトにする
     queryset = Recipe.objects.all() # querysetはこのViewSetの中で触れるObjectのリスト
-    authentication_classes = [TokenAuthentication]
+    ordering = ('-id',)
+    search_ordering = ('-rank', '-id')
+    related_fields = ('tags', 'ingredients')
+    related_querysets = {
+        'tags': Tag.objects.order_by('id'),
+        'ingredients': Ingredient.objects.order_by('id'),
+    }
+    export_chunk_size = 1000
+    bulk_max_recipes = 500
+    export_content_types = {
+        filters.OUTPUT_JSON: 'application/json',
+        filters.OUTPUT_NDJSON: 'application/x-ndjson',
+    }
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
 
-    # 131 Implement recipe filter feature
-    def _params_to_ints(self, qs):
-        """Convert a list of strings to integers."""
-        # パラメーターについている"1,2,3"などの文字列を[1,2,3]のInt配列にする。
-        return [int(str_id) for str_id in qs.split(',')]
+    def get_search(self):
+        """Return the full text search terms of the request."""
+        return filters.parse_search(self.request.query_params.get('search'))
+
+    def get_ordering(self):
+        """Order search results by relevance."""
+        if self.get_search():
+            return self.search_ordering
+
+        return self.ordering
+
+    def get_fields(self):
+        """Return the fields selected with ?fields= on read actions."""
+        value = self.request.query_params.get('fields')
+        if not value or self.action not in ('list', 'retrieve', 'export'):
+            return None
+
+        return filters.parse_fields(
+            value,
+            self.get_serializer_class().Meta.fields,
+        )
 
     # Overrideする。list取得専用...ではない！
     # これは実はdetailの時も呼び出されるが、その場合はget_querysetが呼び出された後に、DRFの内部でpk=pkのオブジェクトが呼び出されている。分かりづらい。。。
@@ -68,28 +192,108 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # 131 Implement recipe filter feature
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = filters.parse_match(self.request.query_params.get('match'))
+        search = self.get_search()
         queryset = self.queryset
+        if search:
+            queryset = filters.search_recipes(queryset, search)
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = filters.parse_id_list(tags, 'tags')
+            queryset = filters.filter_recipes_by_related(
+                queryset, 'tags', tag_ids, match,
+            )
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = filters.parse_id_list(ingredients, 'ingredients')
+            queryset = filters.filter_recipes_by_related(
+                queryset, 'ingredients', ingredient_ids, match,
+            )
 
-        return queryset.filter(
+        queryset = queryset.filter(
             user=self.request.user
-        ).order_by('-id').distinct()
+        ).order_by(*self.get_ordering())
+
+        # Only load the columns and relations of the requested fields.
+        fields = self.get_fields()
+        related = self.related_fields
+        if fields is not None:
+            related = [name for name in related if name in fields]
+            queryset = queryset.only(*[
+                name for name in fields if name not in self.related_fields
+            ])
+
+        # Nested tags and ingredients are listed in id order.
+        return queryset.prefetch_related(*[
+            Prefetch(name, queryset=self.related_querysets[name])
+            for name in related
+        ])
 
     # detail取得用
     def get_serializer_class(self):
         """Return teh sereializer class for request."""
-        if self.action == 'list': # これはurlを見て、recipes/などでアクセスすると、勝手にaction属性にlistをつけてくれるらしい。。
+        if self.action in ('list', 'export', 'bulk'): # これはurlを見て、recipes/などでアクセスすると、勝手にaction属性にlistをつけてくれるらしい。。
             return serializers.RecipeSerializer
         elif self.action == 'upload_image': # 126 Implement image API
             return serializers.RecipeImageSerializer # 下にあるupload_image関数から呼び出すために。
 
         return self.serializer_class
 
+    def get_fast_fields(self):
+        """Return the fields rendered by the fast list path."""
+        return self.get_fields() or serializers.RecipeSerializer.Meta.fields
+
+    def get_fast_rows(self, queryset):
+        """Return the recipes as rows for the fast list path."""
+        return fast.recipe_values(queryset, self.get_fast_fields())
+
+    def build_fast_data(self, rows):
+        """Return the representation of recipe rows."""
+        return fast.build_recipes(rows, self.get_fast_fields(), self.request)
+
+    def get_serializer(self, *args, **kwargs):
+        """Return the serializer limited to the requested fields."""
+        fields = self.get_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+
+        return super().get_serializer(*args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the recipe unless the client copy is current."""
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all the matching recipes of the user."""
+        output = filters.parse_output(request.query_params.get('output'))
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            fast.stream_recipes(
+                queryset,
+                self.get_fast_fields(),
+                self.export_chunk_size,
+                ndjson=output == filters.OUTPUT_NDJSON,
+                request=request,
+            ),
+            content_type=self.export_content_types[output],
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{output}"'
+        return response
+
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create many recipes in one transaction."""
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=self.bulk_max_recipes,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     # 85: implement create api
     def perform_create(self, serializer):
         """Create a new recipe."""
@@ -100,10 +304,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def upload_image(self, request, pk=None):
         """Upload an image to recipe."""
         recipe = self.get_object()
+        # Stream the upload to disk, rejecting it as early as possible.
+        handler = uploads.ImageUploadHandler.install(request, recipe)
         serializer = self.get_serializer(recipe, data=request.data)
+        if handler.error:
+            raise ValidationError({'image': [handler.error]})
 
         if serializer.is_valid():
-            serializer.save()
+            upload = serializer.validated_data['image']
+            previous = recipe.renditions
+            previous_stored_image_id = recipe.stored_image_id
+            with transaction.atomic():
+                if settings.RECIPE_IMAGE_CONTENT_ADDRESSED:
+                    # Identical images are stored once and shared.
+                    stored_image = images.store_image(upload)
+                    image = stored_image.image.name
+                else:
+                    stored_image = None
+                    image = upload
+                # The renditions of the new image are rendered by the image
+                # jobs, unless a recipe sharing it has them already.
+                serializer.save(
+                    image=image,
+                    stored_image=stored_image,
+                    image_size=upload.size,
+                    renditions={},
+                    thumbnail=None,
+                )
+                images.release_image(previous_stored_image_id)
+                images.schedule_renditions(recipe)
+            images.release_renditions(previous, previous_stored_image_id)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -121,12 +351,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ]
     )
 )
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(ConditionalGetMixin,
+                            CachedListMixin,
+                            fast.FastListMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for recipe attributes."""
-    authentication_classes = [TokenAuthentication]
+    ordering = ('-name', '-id')
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -139,11 +376,104 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = filters.filter_assigned(queryset, self.recipe_field)
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by(*self.ordering)
+
+    @extend_schema(
+        request=serializers.BulkIdsSerializer,
+        responses=inline_serializer(
+            'MergeResponse',
+            {
+                'merged': drf_serializers.IntegerField(),
+                'recipes': drf_serializers.IntegerField(),
+            },
+        ),
+    )
+    @action(methods=['POST'], detail=True, url_path='merge')
+    def merge(self, request, pk=None):
+        """Merge other objects of the user into this one."""
+        target = self.get_object()
+        serializer = serializers.BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        sources = self.queryset.filter(
+            user=request.user,
+            id__in=serializer.validated_data['ids'],
+        ).exclude(id=target.id)
+        merged, moved = serializers.merge_related(
+            self.recipe_field,
+            target,
+            sources,
+        )
+
+        return Response({'merged': merged, 'recipes': moved})
+
+    @extend_schema(
+        request=serializers.BulkRenameSerializer,
+        responses=inline_serializer(
+            'BulkUpdateResponse',
+            {'updated': drf_serializers.IntegerField()},
+        ),
+    )
+    @action(methods=['PATCH'], detail=False, url_path='bulk', url_name='bulk')
+    def bulk_update(self, request):
+        """Rename many objects of the user at once."""
+        serializer = serializers.BulkRenameSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        names = {
+            item['id']: item['name']
+            for item in serializer.validated_data['items']
+        }
+
+        # The unique constraint is checked row by row, so the objects are
+        # first moved out of the way under placeholder names. Otherwise
+        # chained renames (a -> b, b -> c) would pass or fail depending on
+        # the order the rows are updated in.
+        queryset = self.queryset.filter(user=request.user, id__in=names)
+        placeholder = f'{uuid.uuid4().hex}:'
+        try:
+            with transaction.atomic():
+                queryset.update(name=Concat(
+                    Value(placeholder),
+                    Cast('id', CharField()),
+                ))
+                updated = queryset.update(
+                    name=Case(*[
+                        When(id=pk, then=Value(name))
+                        for pk, name in names.items()
+                    ]),
+                    updated_at=timezone.now(),
+                )
+        except IntegrityError:
+            raise ValidationError({
+                'items': ['A name is already used by another object.'],
+            })
+
+        return Response({'updated': updated})
+
+    @extend_schema(
+        request=serializers.BulkIdsSerializer,
+        responses=inline_serializer(
+            'BulkDeleteResponse',
+            {'deleted': drf_serializers.IntegerField()},
+        ),
+    )
+    @bulk_update.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete many objects of the user at once."""
+        serializer = serializers.BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        model = self.queryset.model
+        _, deleted = self.queryset.filter(
+            user=request.user,
+            id__in=serializer.validated_data['ids'],
+        ).delete()
+
+        return Response({'deleted': deleted.get(model._meta.label, 0)})
 
 
 # AFTER REFACTORING: 92 Implement tag listing API
@@ -151,12 +481,25 @@ class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database."""
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    recipe_field = 'tags'
 
 # AFTER REFACTORING: 107 Implement ingredient listing API
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database."""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+    recipe_field = 'ingredients'
+
+
+@api_view(['GET'])
+@authentication_classes([
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+])
+@permission_classes([IsAdminUser])
+def list_cache_stats(request):
+    """Return the hit and miss counters of the list cache."""
+    return Response(get_stats())
 
 
 # # 92 Implement tag listing API
@@ -0,0 +1,389 @@
+"""
+Token authentication with cached token lookups, and signed tokens.
+
+DRF's TokenAuthentication reads the token and its user from the database
+on every request. CachedTokenAuthentication keeps what authentication
+needs of the token and its user, but not the password hash or profile, in
+the shared cache and in a small in-process LRU in front of it. Views which
+need the whole user load it themselves.
+
+Every invalidation of a token deletes its shared entry and bumps its
+revision in the shared cache. Entries remember the revision they were read
+at and are only used while it is unchanged, so a deleted token, a password
+change or a deactivated user is seen by every process on its next
+request, and a lookup racing with an invalidation can never be cached as
+current. This relies on the cache being shared by every process, see the
+CACHES setting.
+
+The hit and miss counters are kept per process and added to the shared
+counters every STATS_FLUSH_INTERVAL seconds, so a local hit only reads the
+revision from the shared cache.
+
+Updates made with QuerySet.update() bypass the signals and must call
+invalidate_user() themselves.
+
+DB tokens expire after TOKEN_TTL seconds without use. Token.created is
+used as the time of last use and is moved forward when the token is used,
+at most once per TOKEN_RENEW_INTERVAL, so most requests do not write.
+
+SignedTokenAuthentication accepts the stateless access tokens of
+user/tokens.py as "Authorization: Bearer <token>".
+"""
+import threading
+import time
+from collections import (
+    Counter,
+    OrderedDict,
+)
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from user import tokens
+
+
+TOKEN_KEY = 'auth:token:{key}'
+REVISION_KEY = 'auth:revision:{key}'
+# The user fields kept in the token caches.
+USER_FIELDS = ['is_active', 'is_staff', 'is_superuser']
+LOCAL_HITS_KEY = 'auth:token-cache:local-hits'
+SHARED_HITS_KEY = 'auth:token-cache:shared-hits'
+MISSES_KEY = 'auth:token-cache:misses'
+# Seconds between flushes of the counters of a process to the shared cache.
+STATS_FLUSH_INTERVAL = 10
+
+
+def _incr(key, delta=1):
+    """Increment a counter, creating it if needed."""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def get_revision(key):
+    """Return the shared revision of the cached lookups of a token."""
+    revision_key = REVISION_KEY.format(key=key)
+    revision = cache.get(revision_key)
+    if revision is None:
+        # A new revision never matches an entry, so an evicted or expired
+        # revision only costs a database read.
+        revision = time.time_ns()
+        if not cache.add(
+            revision_key,
+            revision,
+            timeout=settings.TOKEN_AUTH_CACHE_TIMEOUT,
+        ):
+            revision = cache.get(revision_key) or revision
+
+    return revision
+
+
+def bump_revision(key):
+    """Make every process drop its local entry of a token."""
+    revision_key = REVISION_KEY.format(key=key)
+    revision = max(time.time_ns(), (cache.get(revision_key) or 0) + 1)
+    cache.set(
+        revision_key,
+        revision,
+        timeout=settings.TOKEN_AUTH_CACHE_TIMEOUT,
+    )
+
+    return revision
+
+
+def token_entry(token):
+    """Return the fields of a token and its user kept in the caches."""
+    entry = {'created': token.created, 'user_id': token.user_id}
+    entry.update((name, getattr(token.user, name)) for name in USER_FIELDS)
+
+    return entry
+
+
+def build_token(key, entry):
+    """Return a token and its user from a cache entry, without queries."""
+    user = get_user_model()(
+        pk=entry['user_id'],
+        **{name: entry[name] for name in USER_FIELDS},
+    )
+    token = Token(key=key, user=user, created=entry['created'])
+    for instance in [user, token]:
+        instance._state.adding = False
+        instance._state.db = 'default'
+
+    return token
+
+
+class LocalTokenCache:
+    """
+    Thread safe LRU of tokens with a time to live.
+
+    It also counts the lookups of the process, so a hit does not write to
+    the shared cache.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.counts = Counter()
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def get(self, key, revision):
+        """Return the token of the key if it is fresh."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            token, entry_revision, expires = entry
+            if entry_revision != revision or expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            self.counts[LOCAL_HITS_KEY] += 1
+            return token
+
+    def count(self, counter_key):
+        """Count a lookup of the process."""
+        with self.lock:
+            self.counts[counter_key] += 1
+
+    def take_counts(self, force=False):
+        """Return and reset the counts once per STATS_FLUSH_INTERVAL."""
+        now = time.monotonic()
+        with self.lock:
+            if not force and now < self.flushed_at + STATS_FLUSH_INTERVAL:
+                return {}
+            counts = self.counts
+            self.counts = Counter()
+            self.flushed_at = now
+            return counts
+
+    def set(self, key, token, revision):
+        """Store a token, evicting the least recently used entries."""
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (token, revision, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        """Drop the entry of a key."""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry."""
+        with self.lock:
+            self.entries.clear()
+
+
+local_tokens = LocalTokenCache(
+    settings.TOKEN_AUTH_LOCAL_CACHE_SIZE,
+    settings.TOKEN_AUTH_LOCAL_CACHE_TTL,
+)
+
+
+def invalidate_token(key):
+    """Forget the cached lookup of a token."""
+    cache.delete(TOKEN_KEY.format(key=key))
+    local_tokens.delete(key)
+    bump_revision(key)
+
+
+def invalidate_user(user_id):
+    """Forget the cached lookups of every token of a user."""
+    for key in Token.objects.filter(user_id=user_id).values_list(
+        'key', flat=True,
+    ):
+        invalidate_token(key)
+
+
+def is_expired(token, now):
+    """Return whether a token was unused for longer than TOKEN_TTL."""
+    ttl = settings.TOKEN_TTL
+
+    return bool(ttl) and token.created < now - timedelta(seconds=ttl)
+
+
+def renew_token(token, now):
+    """Mark a token as used now, unless it was renewed recently."""
+    renewed_before = now - timedelta(seconds=settings.TOKEN_RENEW_INTERVAL)
+    if token.created >= renewed_before:
+        return False
+
+    # The filter skips the write if another process renewed it first.
+    Token.objects.filter(
+        key=token.key,
+        created__lt=renewed_before,
+    ).update(created=now)
+    token.created = now
+
+    return True
+
+
+def get_or_create_token(user):
+    """Return a valid token of the user, replacing an expired one."""
+    token, created = Token.objects.get_or_create(user=user)
+    if created:
+        return token
+
+    now = timezone.now()
+    if is_expired(token, now):
+        token.delete()
+        token, created = Token.objects.get_or_create(user=user)
+    else:
+        renew_token(token, now)
+
+    return token
+
+
+def flush_stats(force=False):
+    """Add the counts of the process to the shared counters when due."""
+    for counter_key, count in local_tokens.take_counts(force).items():
+        _incr(counter_key, count)
+
+
+def get_stats():
+    """Return the hit and miss counters of the token cache."""
+    # Other processes flush theirs within STATS_FLUSH_INTERVAL.
+    flush_stats(force=True)
+    counters = cache.get_many([LOCAL_HITS_KEY, SHARED_HITS_KEY, MISSES_KEY])
+    local_hits = counters.get(LOCAL_HITS_KEY, 0)
+    shared_hits = counters.get(SHARED_HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = local_hits + shared_hits + misses
+
+    return {
+        'local_hits': local_hits,
+        'shared_hits': shared_hits,
+        'misses': misses,
+        'hit_ratio': (local_hits + shared_hits) / total if total else 0.0,
+    }
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication which caches the token and user lookup."""
+
+    def get_cached_token(self, key, revision):
+        """Return the cached token of a key, if any."""
+        entry = local_tokens.get(key, revision)
+        if entry is not None:
+            return build_token(key, entry)
+
+        entry, entry_revision = cache.get(
+            TOKEN_KEY.format(key=key),
+            (None, None),
+        )
+        if entry is None or entry_revision != revision:
+            return None
+        local_tokens.count(SHARED_HITS_KEY)
+        local_tokens.set(key, entry, revision)
+
+        return build_token(key, entry)
+
+    def cache_token(self, key, token, revision):
+        """Store a token in both cache layers."""
+        entry = token_entry(token)
+        cache.set(
+            TOKEN_KEY.format(key=key),
+            (entry, revision),
+            timeout=settings.TOKEN_AUTH_CACHE_TIMEOUT,
+        )
+        local_tokens.set(key, entry, revision)
+
+    def authenticate_credentials(self, key):
+        """Return the user and token of a key, from the cache if possible."""
+        revision = get_revision(key)
+        now = timezone.now()
+        token = self.get_cached_token(key, revision)
+        flush_stats()
+        # A cached token may have been renewed by another process since.
+        if token is None or is_expired(token, now):
+            if token is None:
+                local_tokens.count(MISSES_KEY)
+            user, token = super().authenticate_credentials(key)
+            self.cache_token(key, token, revision)
+
+        if is_expired(token, now):
+            raise AuthenticationFailed('Token expired.')
+        if renew_token(token, now):
+            self.cache_token(key, token, revision)
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+
+        return token.user, token
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authenticate signed access tokens without reading the database."""
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        """Return the user and payload of a bearer token."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Invalid bearer header.')
+
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed('Invalid token.')
+        payload = tokens.read_token(token, tokens.ACCESS)
+
+        return tokens.get_token_user(payload), payload
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Invalidate a token when it is deleted."""
+    invalidate_token(instance.key)
+
+
+@receiver(pre_save, sender=get_user_model())
+def detect_credentials_change(sender, instance, **kwargs):
+    """Note whether a save changes the password or deactivates the user."""
+    previous = sender.objects.filter(pk=instance.pk).values(
+        'password',
+        'is_active',
+    ).first() if instance.pk else None
+    instance._credentials_changed = previous is not None and (
+        previous['password'] != instance.password or
+        (previous['is_active'] and not instance.is_active)
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_saved_user(sender, instance, created, **kwargs):
+    """Invalidate the tokens of a user when the user is saved."""
+    if not created:
+        invalidate_user(instance.pk)
+    if getattr(instance, '_credentials_changed', False):
+        tokens.revoke_tokens(instance.pk)
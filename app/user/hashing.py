@@ -0,0 +1,129 @@
+"""
+Password hashing off the request thread.
+
+Hashing a password runs PBKDF2 for tens of milliseconds of CPU. Logins and
+registrations hash in a small thread pool of each process instead, which
+caps how many CPUs hashing can take. hashlib releases the GIL while it
+hashes, so the other threads of a uwsgi worker keep serving requests.
+Once PASSWORD_HASHING_QUEUE hashes wait for the pool, further ones are
+rejected with a 503 instead of queueing without bound.
+
+Only the hashing runs in the pool. Database reads and writes stay on the
+request thread and its connection.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth import hashers
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    """Raised when too many passwords are waiting to be hashed."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again later.'
+    default_code = 'hashing_busy'
+    # Sent as Retry-After by the DRF exception handler.
+    wait = 1
+
+
+class HashingPool:
+    """Thread pool with a bounded number of running and waiting tasks."""
+
+    def __init__(self, workers, queue):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix='password-hashing',
+        )
+        self.slots = threading.BoundedSemaphore(workers + queue)
+
+    def run(self, function, *args, timeout=None):
+        """Return the result of a function run in the pool."""
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self.executor.submit(function, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda future: self.slots.release())
+
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HashingBusy()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the hashing pool of the process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(
+                settings.PASSWORD_HASHING_WORKERS,
+                settings.PASSWORD_HASHING_QUEUE,
+            )
+
+    return _pool
+
+
+def run(function, *args):
+    """Run a hashing function in the pool, if there is one."""
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return function(*args)
+
+    return get_pool().run(
+        function,
+        *args,
+        timeout=settings.PASSWORD_HASHING_TIMEOUT,
+    )
+
+
+def make_password(password):
+    """Return the hash of a password."""
+    return run(hashers.make_password, password)
+
+
+def authenticate(email, password):
+    """
+    Return the active user of the credentials, or None.
+
+    Behaves like ModelBackend, including hashing for unknown emails so they
+    take as long as wrong passwords, and upgrading outdated hashes.
+    """
+    user_model = get_user_model()
+    try:
+        user = user_model._default_manager.get_by_natural_key(email)
+    except user_model.DoesNotExist:
+        make_password(password)
+        return None
+
+    # The setter is called in the pool, so it only records that the hash
+    # must be upgraded.
+    outdated = []
+    valid = run(
+        hashers.check_password,
+        password,
+        user.password,
+        outdated.append,
+    )
+    if not valid or not user.is_active:
+        return None
+
+    if outdated:
+        # update() skips the signals, as the password did not change.
+        user.password = make_password(password)
+        user_model._default_manager.filter(pk=user.pk).update(
+            password=user.password,
+        )
+
+    return user
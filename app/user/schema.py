@@ -0,0 +1,13 @@
+"""
+OpenAPI extensions for the user authentication classes.
+"""
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+
+
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    """Describe SignedTokenAuthentication as HTTP bearer authentication."""
+    target_class = 'user.authentication.SignedTokenAuthentication'
+    name = 'bearerAuth'
+
+    def get_security_definition(self, auto_schema):
+        return {'type': 'http', 'scheme': 'bearer'}
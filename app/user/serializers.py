@@ -1,14 +1,13 @@
 """
 Serializers for the user API View.
 """
-from django.contrib.auth import (
-    get_user_model,
-    authenticate,
-)
+from django.contrib.auth import get_user_model
 from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from user import hashing
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user object."""
@@ -20,7 +19,16 @@ class UserSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """Create and return a user with encrypted password."""
-        return get_user_model().objects.create_user(**validated_data)
+        # Hash in the pool of user/hashing.py, like create_user() would.
+        password = hashing.make_password(validated_data.pop('password'))
+        user_model = get_user_model()
+        validated_data['email'] = user_model.objects.normalize_email(
+            validated_data['email'],
+        )
+        user = user_model(password=password, **validated_data)
+        user.save()
+
+        return user
 
     def update(self, instance, validated_data): # updateメソッドをオーバーライド。instanceは今のユーザーのinstance。
         """Update and return user."""
@@ -31,7 +39,7 @@ class UserSerializer(serializers.ModelSerializer):
 
         # もしパスワードも変更要望があれば
         if password:
-            user.set_password(password)
+            user.password = hashing.make_password(password)
             user.save()
 
         return user # 最後にuserを返すのがupdateをオーバーライドした時のお約束
@@ -53,17 +61,24 @@ class AuthTokenSerializer(serializers.Serializer):
         email = attrs.get('email') # リクエストのデータ（attributes）からemailをretrieveする。
         password = attrs.get('password') # 同じくpassword
 
-        # authenticateはdjangoのメソッド。
-        # request, username, passwordの3つを渡すと、DBに実際にユーザが存在して、パスワードもあっていれば、userオブジェクトを返す
-        # なんらかエラーがあれば空のオブジェクトを返す
-        user = authenticate(
-            request=self.context.get('request'), # contextの指定だが、これをなぜやるかは先生も知らないとのこと。必須だから書いている。
-            username=email, # 我々の仕組みではユーザネーム=emailなので、emailを渡す
-            password=password,
-        )
+        # Like django's authenticate(), returns the user if it exists and the
+        # password matches, or None. The hashing runs in the pool of
+        # user/hashing.py.
+        user = hashing.authenticate(email, password)
         if not user:
             msg = ('Unable to authenticate with provided credentials.')
             raise serializers.ValidationError(msg, code='authorization') # メッセージを含むHTTP_400_REQUESTを返す
 
         attrs['user'] = user # 認証がうまく行ったら、アトリビュートの中にもうユーザーを含めちゃう。
         return attrs # 最終的に上書きしたアトリビュートを返す
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for refreshing signed tokens."""
+    refresh = serializers.CharField()
+
+
+class TokenPairSerializer(serializers.Serializer):
+    """Serializer for a pair of signed tokens."""
+    access = serializers.CharField()
+    refresh = serializers.CharField()
@@ -0,0 +1,347 @@
+"""
+Tests for the cached token authentication.
+"""
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import (
+    LOCAL_HITS_KEY,
+    STATS_FLUSH_INTERVAL,
+    TOKEN_KEY,
+    LocalTokenCache,
+    flush_stats,
+    local_tokens,
+)
+
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+STATS_URL = reverse('user:token-cache-stats')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token lookups are cached and invalidated."""
+
+    def setUp(self):
+        flush_stats(force=True)
+        cache.clear()
+        local_tokens.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test only the first request reads the token."""
+        # The view loads the profile itself.
+        with self.assertNumQueries(2):
+            self.client.get(ME_URL)
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_shared_cache_used_by_other_processes(self):
+        """Test a process without a local entry reads the shared cache."""
+        self.client.get(ME_URL)
+        local_tokens.clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token(self):
+        """Test an unknown token is rejected."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token is rejected on the next request."""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected_by_other_processes(self):
+        """Test another process drops its local entry of a deleted token."""
+        self.client.get(ME_URL)
+        entries = dict(local_tokens.entries)
+
+        self.token.delete()
+        local_tokens.entries.update(entries)
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_rejected(self):
+        """Test deactivating a user takes effect immediately."""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_reloads_user(self):
+        """Test changing the password drops the cached user."""
+        self.client.get(ME_URL)
+
+        self.user.set_password('newpass123')
+        self.user.save()
+        with self.assertNumQueries(2):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_other_user_save_keeps_token_cached(self):
+        """Test saving another user does not drop this cached token."""
+        self.client.get(ME_URL)
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        Token.objects.create(user=other_user)
+
+        other_user.name = 'Other Name'
+        other_user.save()
+        other_user.auth_token.delete()
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_cached_entry_without_credentials(self):
+        """Test the cache only keeps the fields authentication needs."""
+        self.client.get(ME_URL)
+
+        entry, revision = cache.get(TOKEN_KEY.format(key=self.token.key))
+
+        self.assertEqual(entry['user_id'], self.user.pk)
+        self.assertTrue(entry['is_active'])
+        self.assertNotIn('password', entry)
+        self.assertNotIn('email', entry)
+        self.assertNotIn(self.user.password, repr(entry))
+
+    def test_profile_update_not_stale(self):
+        """Test an update through the API is seen on the next request."""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'Updated Name'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Updated Name')
+
+    def test_stats(self):
+        """Test the cache hit ratio is reported to admins."""
+        self.client.get(ME_URL)
+        self.client.get(ME_URL)
+        local_tokens.clear()
+        self.client.get(ME_URL)
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+        )
+        admin_client = APIClient()
+        admin_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=admin).key}'
+        )
+
+        forbidden = self.client.get(STATS_URL)
+        res = admin_client.get(STATS_URL)
+
+        self.assertEqual(forbidden.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(res.data['local_hits'], 2)
+        self.assertEqual(res.data['shared_hits'], 1)
+        self.assertEqual(res.data['misses'], 2)
+        self.assertEqual(res.data['hit_ratio'], 3 / 5)
+
+    def test_local_hit_counted_in_process(self):
+        """Test local hits are only flushed to the shared cache at times."""
+        self.client.get(ME_URL)
+        flush_stats(force=True)
+
+        with patch('user.authentication.cache.incr') as incr:
+            self.client.get(ME_URL)
+        incr.assert_not_called()
+
+        later = time.monotonic() + STATS_FLUSH_INTERVAL
+        with patch('user.authentication.time.monotonic', return_value=later):
+            self.client.get(ME_URL)
+        self.assertEqual(cache.get(LOCAL_HITS_KEY), 2)
+
+
+@override_settings(TOKEN_TTL=3600, TOKEN_RENEW_INTERVAL=60)
+class TokenExpiryTests(TestCase):
+    """Test tokens expire unless they are used."""
+
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def age_token(self, seconds):
+        """Move the last use of the token into the past."""
+        created = timezone.now() - timedelta(seconds=seconds)
+        Token.objects.filter(pk=self.token.pk).update(created=created)
+
+        return created
+
+    def get_created(self):
+        """Return the time of last use of the token."""
+        return Token.objects.get(pk=self.token.pk).created
+
+    def test_recent_token_not_renewed(self):
+        """Test requests within the renew interval do not write."""
+        created = self.age_token(30)
+
+        with self.assertNumQueries(2):
+            self.client.get(ME_URL)
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_created(), created)
+
+    def test_token_renewed(self):
+        """Test using a token moves its expiry once per renew interval."""
+        created = self.age_token(600)
+
+        with self.assertNumQueries(3):
+            self.client.get(ME_URL)
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertGreater(self.get_created(), created)
+
+    def test_expired_token_rejected(self):
+        """Test a token unused for longer than TOKEN_TTL is rejected."""
+        self.age_token(3601)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_token_expires(self):
+        """Test a cached token is rejected once it expires."""
+        self.client.get(ME_URL)
+
+        with patch(
+            'user.authentication.timezone.now',
+            return_value=timezone.now() + timedelta(seconds=3601),
+        ):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_renewed_by_other_process(self):
+        """Test a stale cached token is read again before it is rejected."""
+        self.client.get(ME_URL)
+        later = timezone.now() + timedelta(seconds=3601)
+        Token.objects.filter(pk=self.token.pk).update(created=later)
+
+        with patch('user.authentication.timezone.now', return_value=later):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(TOKEN_TTL=0)
+    def test_expiry_disabled(self):
+        """Test tokens never expire without a TOKEN_TTL."""
+        self.age_token(365 * 24 * 3600)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_login_renews_token(self):
+        """Test logging in returns the current token and renews it."""
+        created = self.age_token(600)
+
+        res = APIClient().post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'testpass123',
+        })
+
+        self.assertEqual(res.data['token'], self.token.key)
+        self.assertGreater(self.get_created(), created)
+
+    def test_login_rotates_expired_token(self):
+        """Test logging in replaces an expired token with a new key."""
+        self.age_token(3601)
+
+        res = APIClient().post(TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'testpass123',
+        })
+
+        self.assertNotEqual(res.data['token'], self.token.key)
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+        new_client = APIClient()
+        new_client.credentials(HTTP_AUTHORIZATION=f'Token {res.data["token"]}')
+        self.assertEqual(
+            new_client.get(ME_URL).status_code,
+            status.HTTP_200_OK,
+        )
+
+
+class LocalTokenCacheTests(TestCase):
+    """Test the in-process token LRU."""
+
+    def test_least_recently_used_evicted(self):
+        """Test the LRU keeps at most max_size entries."""
+        tokens = LocalTokenCache(max_size=2, ttl=60)
+        tokens.set('a', 'token a', 1)
+        tokens.set('b', 'token b', 1)
+        tokens.get('a', 1)
+        tokens.set('c', 'token c', 1)
+
+        self.assertEqual(tokens.get('a', 1), 'token a')
+        self.assertIsNone(tokens.get('b', 1))
+        self.assertEqual(tokens.get('c', 1), 'token c')
+
+    def test_expired_and_stale_entries_dropped(self):
+        """Test entries past their TTL or revision are not returned."""
+        tokens = LocalTokenCache(max_size=10, ttl=60)
+        tokens.set('a', 'token a', 1)
+        tokens.set('b', 'token b', 1)
+
+        with patch(
+            'user.authentication.time.monotonic',
+            return_value=time.monotonic() + 61,
+        ):
+            self.assertIsNone(tokens.get('a', 1))
+        self.assertIsNone(tokens.get('b', 2))
+        self.assertEqual(tokens.entries, {})
@@ -0,0 +1,128 @@
+"""
+Tests for password hashing in the hashing pool.
+"""
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import hashing
+from user.tokens import REVOKED_KEY
+
+
+TOKEN_URL = reverse('user:token')
+CREATE_USER_URL = reverse('user:create')
+
+
+class HashingPoolTests(TestCase):
+    """Test the bounded hashing pool."""
+
+    def test_run(self):
+        """Test a function runs in the pool and returns its result."""
+        pool = hashing.HashingPool(workers=1, queue=0)
+
+        self.assertEqual(pool.run(sum, [1, 2]), 3)
+        self.assertTrue(pool.slots.acquire(blocking=False))
+
+    def test_full_pool_rejects(self):
+        """Test tasks beyond the workers and queue are rejected."""
+        pool = hashing.HashingPool(workers=1, queue=1)
+        pool.slots.acquire()
+        pool.slots.acquire()
+
+        with self.assertRaises(hashing.HashingBusy):
+            pool.run(sum, [1, 2])
+
+    def test_timeout(self):
+        """Test waiting too long for the pool is rejected."""
+        pool = hashing.HashingPool(workers=1, queue=0)
+
+        with self.assertRaises(hashing.HashingBusy):
+            pool.run(time.sleep, 0.5, timeout=0.01)
+
+
+class HashingApiTests(TestCase):
+    """Test logins and registrations hash in the pool."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.payload = {'email': 'user@example.com', 'password': 'testpass123'}
+
+    def test_login_when_busy(self):
+        """Test logins are rejected with a 503 when the pool is full."""
+        pool = hashing.HashingPool(workers=1, queue=0)
+        pool.slots.acquire()
+
+        with patch('user.hashing.get_pool', return_value=pool):
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+
+    def test_register_when_busy(self):
+        """Test registrations are rejected with a 503 when the pool is full."""
+        pool = hashing.HashingPool(workers=1, queue=0)
+        pool.slots.acquire()
+
+        with patch('user.hashing.get_pool', return_value=pool):
+            res = self.client.post(CREATE_USER_URL, {
+                'email': 'new@example.com',
+                'password': 'testpass123',
+                'name': 'New',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(
+            get_user_model().objects.filter(email='new@example.com').exists()
+        )
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_hash_in_request_thread(self):
+        """Test the pool is not used without hashing workers."""
+        with patch('user.hashing.get_pool') as get_pool:
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        get_pool.assert_not_called()
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_outdated_hash_upgraded(self):
+        """Test logging in upgrades the hash without revoking tokens."""
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=make_password('testpass123', hasher='md5'),
+        )
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(self.user.check_password('testpass123'))
+        self.assertIsNone(cache.get(REVOKED_KEY.format(user_id=self.user.pk)))
+
+    def test_inactive_user(self):
+        """Test inactive users cannot log in."""
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,232 @@
+"""
+Tests for the signed access and refresh tokens.
+"""
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user import tokens as user_tokens
+
+
+SIGNED_URL = reverse('user:token-signed')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+TAGS_URL = reverse('recipe:tag-list')
+STATS_URL = reverse('user:token-cache-stats')
+
+
+class SignedTokenTests(TestCase):
+    """Test the signed token endpoints and authentication."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.client = APIClient()
+
+    def get_tokens(self, email='user@example.com', password='testpass123'):
+        """Return a new pair of tokens."""
+        res = self.client.post(SIGNED_URL, {
+            'email': email,
+            'password': password,
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def get(self, url, token):
+        """Make a GET request with a bearer token."""
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_bad_credentials(self):
+        """Test no tokens are issued for invalid credentials."""
+        res = self.client.post(SIGNED_URL, {
+            'email': 'user@example.com',
+            'password': 'wrong',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('access', res.data)
+
+    def test_access_token_without_database(self):
+        """Test an access token is verified without reading the database."""
+        access = self.get_tokens()['access']
+
+        # Only the tag list itself.
+        with self.assertNumQueries(1):
+            res = self.get(TAGS_URL, access)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_me_with_access_token(self):
+        """Test the profile is loaded for signed tokens."""
+        access = self.get_tokens()['access']
+
+        res = self.get(ME_URL, access)
+
+        self.assertEqual(res.data, {
+            'email': 'user@example.com',
+            'name': 'Test Name',
+        })
+
+    def test_invalid_tokens_rejected(self):
+        """Test tampered, refresh and expired tokens are not accepted."""
+        tokens = self.get_tokens()
+        later = time.time() + 301
+
+        tampered = self.get(TAGS_URL, tokens['access'][:-2] + 'xx')
+        refresh = self.get(TAGS_URL, tokens['refresh'])
+        with patch('django.core.signing.time.time', return_value=later):
+            expired = self.get(TAGS_URL, tokens['access'])
+
+        for res in [tampered, refresh, expired]:
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh(self):
+        """Test a refresh token returns a new working pair."""
+        tokens = self.get_tokens()
+
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        wrong_kind = self.client.post(REFRESH_URL, {
+            'refresh': tokens['access'],
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get(TAGS_URL, res.data['access']).status_code,
+                         status.HTTP_200_OK)
+        self.assertEqual(
+            wrong_kind.status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    def test_revoke(self):
+        """Test logging out rejects every token issued before."""
+        tokens = self.get_tokens()
+        db_token = Token.objects.create(user=self.user)
+
+        res = self.client.post(
+            REVOKE_URL,
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.get(TAGS_URL, tokens['access']).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        refresh = self.client.post(REFRESH_URL, {
+            'refresh': tokens['refresh'],
+        })
+        self.assertEqual(refresh.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(Token.objects.filter(key=db_token.key).exists())
+        new_access = self.get_tokens()['access']
+        self.assertEqual(
+            self.get(TAGS_URL, new_access).status_code,
+            status.HTTP_200_OK,
+        )
+
+    def test_refresh_revoked_without_cache(self):
+        """Test refresh tokens stay revoked if the cache is lost."""
+        tokens = self.get_tokens()
+        self.client.post(
+            REVOKE_URL,
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}',
+        )
+        cache.clear()
+
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_seen_by_other_cache_clients(self):
+        """Test a token revoked in one process is rejected in another."""
+        tokens = self.get_tokens()
+        # Two clients of one store, like two processes sharing Redis.
+        writer = LocMemCache('revocation-test', {})
+        reader = LocMemCache('revocation-test', {})
+        self.addCleanup(writer.clear)
+
+        with patch.object(user_tokens, 'cache', writer):
+            self.client.post(
+                REVOKE_URL,
+                HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}',
+            )
+        with patch.object(user_tokens, 'cache', reader):
+            res = self.get(TAGS_URL, tokens['access'])
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes(self):
+        """Test changing the password rejects the existing tokens."""
+        tokens = self.get_tokens()
+
+        res = self.client.patch(
+            ME_URL,
+            {'password': 'newpass123'},
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.get(ME_URL, tokens['access']).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass123'))
+
+    def test_profile_change_keeps_tokens(self):
+        """Test updating the name does not log the user out."""
+        tokens = self.get_tokens()
+
+        self.client.patch(
+            ME_URL,
+            {'name': 'New Name'},
+            HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}',
+        )
+        res = self.get(ME_URL, tokens['access'])
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user rejects the existing tokens."""
+        tokens = self.get_tokens()
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(
+            self.get(TAGS_URL, tokens['access']).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        res = self.client.post(REFRESH_URL, {'refresh': tokens['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_claim(self):
+        """Test admin only endpoints accept staff access tokens."""
+        get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+        )
+        admin = self.get_tokens(email='admin@example.com')['access']
+        user = self.get_tokens()['access']
+
+        self.assertEqual(
+            self.get(STATS_URL, admin).status_code,
+            status.HTTP_200_OK,
+        )
+        self.assertEqual(
+            self.get(STATS_URL, user).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
@@ -0,0 +1,121 @@
+"""
+Signed stateless access and refresh tokens.
+
+Tokens are signed with SECRET_KEY through django.core.signing and carry
+the user ID, whether the user is staff and when they were issued, so an
+access token is verified without any database read. Access tokens are
+short lived and only checked against the revocation entry of the user in
+the cache, which must be shared by every process for a revocation to
+reach all of them (see the recipe.E001 check). Refresh tokens live longer
+and are checked against the user row, whose tokens_valid_after is the
+durable record of a revocation.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+
+from rest_framework.exceptions import AuthenticationFailed
+
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+SALT = 'user.tokens.{kind}'
+REVOKED_KEY = 'auth:revoked:{user_id}'
+
+
+def get_lifetime(kind):
+    """Return the lifetime in seconds of a kind of token."""
+    if kind == ACCESS:
+        return settings.ACCESS_TOKEN_LIFETIME
+
+    return settings.REFRESH_TOKEN_LIFETIME
+
+
+def issue_token(user, kind):
+    """Return a signed token of the user."""
+    return signing.dumps(
+        {'uid': user.pk, 'staff': user.is_staff, 'iat': time.time()},
+        salt=SALT.format(kind=kind),
+        compress=True,
+    )
+
+
+def issue_token_pair(user):
+    """Return a new access and refresh token of the user."""
+    return {
+        ACCESS: issue_token(user, ACCESS),
+        REFRESH: issue_token(user, REFRESH),
+    }
+
+
+def read_token(token, kind):
+    """Return the payload of a valid token or raise AuthenticationFailed."""
+    try:
+        payload = signing.loads(
+            token,
+            salt=SALT.format(kind=kind),
+            max_age=get_lifetime(kind),
+        )
+    except signing.SignatureExpired:
+        raise AuthenticationFailed('Token expired.')
+    except signing.BadSignature:
+        raise AuthenticationFailed('Invalid token.')
+
+    revoked_at = cache.get(REVOKED_KEY.format(user_id=payload['uid']))
+    if revoked_at is not None and payload['iat'] <= revoked_at:
+        raise AuthenticationFailed('Token revoked.')
+
+    return payload
+
+
+def get_token_user(payload):
+    """
+    Return a user built from an access token payload.
+
+    The user is not loaded from the database and only has its ID, is_staff
+    and is_active set, which is enough for authentication, permissions and
+    queries filtered by user.
+    """
+    user = get_user_model()(
+        pk=payload['uid'],
+        is_staff=payload['staff'],
+        is_active=True,
+    )
+    user._state.adding = False
+    user._state.db = 'default'
+
+    return user
+
+
+def refresh_token_pair(token):
+    """Return a new token pair for a valid refresh token."""
+    payload = read_token(token, REFRESH)
+    user = get_user_model().objects.filter(
+        pk=payload['uid'],
+        is_active=True,
+    ).first()
+    if user is None:
+        raise AuthenticationFailed('User inactive or deleted.')
+
+    valid_after = user.tokens_valid_after
+    if valid_after is not None and payload['iat'] <= valid_after.timestamp():
+        raise AuthenticationFailed('Token revoked.')
+
+    return issue_token_pair(user)
+
+
+def revoke_tokens(user_id):
+    """Reject every signed token of the user issued until now."""
+    now = time.time()
+    get_user_model().objects.filter(pk=user_id).update(
+        tokens_valid_after=datetime.fromtimestamp(now, tz=timezone.utc),
+    )
+    cache.set(
+        REVOKED_KEY.format(user_id=user_id),
+        now,
+        timeout=settings.ACCESS_TOKEN_LIFETIME,
+    )
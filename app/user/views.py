@@ -1,13 +1,34 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+from drf_spectacular.utils import extend_schema
+
+from django.contrib.auth import get_user_model
+
+from rest_framework import generics, permissions, status
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.settings import api_settings
 
+from user import tokens
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    get_or_create_token,
+    get_stats,
+)
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    RefreshTokenSerializer,
+    TokenPairSerializer,
 )
 
 
@@ -23,15 +44,89 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES # ここはオプションらしい?
 
+    def post(self, request, *args, **kwargs):
+        """Return the token of the user, replacing it if it expired."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = get_or_create_token(serializer.validated_data['user'])
+
+        return Response({'token': token.key})
+
 
 # user:me
 class ManageUserView(generics.RetrieveUpdateAPIView): # その名の通り、retrive（取得）とUpdate（更新）に特化したAPIViewクラス。
     """Manage the authenticated user."""
     serializer_class = UserSerializer # 同じシリアライザを使い回す
-    authentication_classes = [authentication.TokenAuthentication] # どのようにユーザを知るか？方法の指定。
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ] # どのようにユーザを知るか？方法の指定。
     permission_classes = [permissions.IsAuthenticated] # 認証されたユーザのみ使えるAPIである、ということ。
 
     # GETリクエストのメソッドをオーバーライド
     def get_object(self):
         """Retrieve and return the authenticated user."""
-        return self.request.user # 認証されたユーザはself.requestにアサインされているので、それをそのまま使う。
+        # Both token authentications only keep what authentication needs
+        # of the user, so load the profile.
+        return get_user_model().objects.get(pk=self.request.user.pk)
+
+
+class CreateTokenPairView(APIView):
+    """Create signed access and refresh tokens for user."""
+    serializer_class = AuthTokenSerializer
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+
+    @extend_schema(responses=TokenPairSerializer)
+    def post(self, request):
+        serializer = self.serializer_class(
+            data=request.data,
+            context={'request': request},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        return Response(
+            tokens.issue_token_pair(serializer.validated_data['user'])
+        )
+
+
+class RefreshTokenView(APIView):
+    """Exchange a refresh token for a new pair of signed tokens."""
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(responses=TokenPairSerializer)
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(
+            tokens.refresh_token_pair(serializer.validated_data['refresh'])
+        )
+
+
+class RevokeTokensView(APIView):
+    """Log the user out of every signed and database token."""
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(request=None, responses={204: None})
+    def post(self, request):
+        tokens.revoke_tokens(request.user.pk)
+        Token.objects.filter(user_id=request.user.pk).delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET'])
+@authentication_classes([
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+])
+@permission_classes([permissions.IsAdminUser])
+def token_cache_stats(request):
+    """Return the hit and miss counters of the token cache."""
+    return Response(get_stats())